@@ -0,0 +1,152 @@
+import random
+import numpy as np
+
+###########################################################################
+# Batched random rollouts.
+# Many playouts are advanced in lockstep on a stack of boards held in one
+# numpy array of shape (playouts, rows, cols). Every playout starts with the
+# same side to move, so at each ply all the unfinished boards have the same
+# side to move: the legal moves of all of them are found with a few whole
+# array comparisons, one uniformly random move is picked per board and all
+# the moves are applied at once. A playout ends when its side to move is
+# stuck, and that side is its loser, as in MonteCarloPlayer.random_simulation.
+###########################################################################
+
+EMPTY, X, O = 0, 1, 2
+# marks squares off the edge of the board in padded stacks
+OFF = 3
+SYMBOLS = (' ', 'x', 'o')
+PIECES = {' ': EMPTY, 'x': X, 'o': O}
+
+# up, down, left, right
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+_DR = np.array([dr for dr, dc in DIRECTIONS])
+_DC = np.array([dc for dr, dc in DIRECTIONS])
+
+
+def fromList(board) -> np.ndarray:
+    """Returns a game_rules board as a (rows, cols) int8 array."""
+    return np.array([[PIECES[piece] for piece in row] for row in board], dtype=np.int8)
+
+
+def toList(board) -> list:
+    """Returns a (rows, cols) array as a game_rules board."""
+    return [[SYMBOLS[piece] for piece in row] for row in board.tolist()]
+
+
+def _legalMoves(boards, padded, pad, piece, other):
+    # One (playouts, rows, cols) mask per direction and number of hops, true on
+    # the squares a piece can jump from. A k-hop jump is a (k-1)-hop jump plus
+    # one more enemy piece followed by an empty square.
+    rows, cols = boards.shape[1:]
+    masks, hops = [], []
+    for d, (dr, dc) in enumerate(DIRECTIONS):
+        def shifted(s):
+            r, c = pad + dr * s, pad + dc * s
+            return padded[:, r:r + rows, c:c + cols]
+        run = boards == piece
+        k = 1
+        while True:
+            run = run & (shifted(2 * k - 1) == other) & (shifted(2 * k) == EMPTY)
+            if not run.any():
+                break
+            masks.append(run)
+            hops.append((d, k))
+            k += 1
+    return masks, hops
+
+
+def _padded(boards):
+    n, rows, cols = boards.shape
+    pad = max(rows, cols)
+    padded = np.full((n, rows + 2 * pad, cols + 2 * pad), OFF, dtype=np.int8)
+    padded[:, pad:pad + rows, pad:pad + cols] = boards
+    return padded, pad
+
+
+def countLegalMoves(boards, symbol) -> np.ndarray:
+    """Returns the number of legal moves symbol has on every board of a stack,
+    the batched game_rules.countLegalMoves."""
+    padded, pad = _padded(boards)
+    other = 'o' if symbol == 'x' else 'x'
+    masks, hops = _legalMoves(boards, padded, pad, PIECES[symbol], PIECES[other])
+    return sum(mask.sum(axis=(1, 2)) for mask in masks) if masks else np.zeros(len(boards), dtype=np.intp)
+
+
+def playouts(boards, symbol, rng=None, max_plies=None):
+    """Plays a uniformly random game to the end on every board of a stack.
+
+    Args:
+        boards (np.ndarray): (playouts, rows, cols) int8 stack of positions past
+            the opening moves. It is played on in place.
+        symbol (str): The side to move first on every board.
+        rng (np.random.Generator, optional): Source of randomness. Defaults to
+            one seeded from the random module, so random.seed repeats a run.
+        max_plies (int, optional): Stop every game still going after this many
+            moves. Their loser is None, and the side to move is the same on all of them.
+
+    Returns:
+        [np.ndarray: final boards, list: loser symbol of each playout]
+    """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    n, rows, cols = boards.shape
+    padded, pad = _padded(boards)
+    losers = [None] * n
+    active = np.arange(n)
+    piece, other = PIECES[symbol], PIECES['o' if symbol == 'x' else 'x']
+    plies = 0
+
+    while len(active):
+        current = boards[active]
+        view = padded[:len(active)]
+        view[:, pad:pad + rows, pad:pad + cols] = current
+        masks, hops = _legalMoves(current, view, pad, piece, other)
+        if masks:
+            legal = np.stack(masks, axis=1).reshape(len(active), -1)
+            counts = legal.sum(axis=1)
+        else:
+            counts = np.zeros(len(active), dtype=np.intp)
+
+        stuck = counts == 0
+        for i in active[stuck]:
+            losers[i] = SYMBOLS[piece]
+        if stuck.all() or plies == max_plies:
+            break
+        plies += 1
+        moving = ~stuck
+        active, legal, counts = active[moving], legal[moving], counts[moving]
+
+        # the (choice + 1)-th legal move of each board, uniformly at random
+        choice = (rng.random(len(active)) * counts).astype(np.intp)
+        index = np.argmax(legal.cumsum(axis=1) > choice[:, None], axis=1)
+        which, square = np.divmod(index, rows * cols)
+        r, c = np.divmod(square, cols)
+        d, k = np.array(hops, dtype=np.intp)[which].T
+        dr, dc = _DR[d], _DC[d]
+
+        boards[active, r, c] = EMPTY
+        boards[active, r + 2 * k * dr, c + 2 * k * dc] = piece
+        for j in range(1, int(k.max()) + 1):
+            hop = k >= j
+            boards[active[hop], (r + (2 * j - 1) * dr)[hop], (c + (2 * j - 1) * dc)[hop]] = EMPTY
+
+        piece, other = other, piece
+
+    return [boards, losers]
+
+
+def randomPlayouts(board, symbol, n, rng=None, max_plies=None):
+    """Plays n uniformly random games from one position, see playouts.
+
+    Args:
+        board (list): The game_rules board to start from.
+        symbol (str): The side to move first.
+        n (int): How many games to play.
+        rng (np.random.Generator, optional): Source of randomness.
+        max_plies (int, optional): Stop games still going after this many moves.
+
+    Returns:
+        [np.ndarray: final boards, list: loser symbol of each playout]
+    """
+    return playouts(np.repeat(fromList(board)[None], n, axis=0), symbol, rng, max_plies)
@@ -0,0 +1,237 @@
+import random
+import game_rules
+
+###########################################################################
+# Bitboard representation of a Konane board.
+# Each colour is one Python int; bit (r * cols + c) is set when that colour
+# has a piece on square (r, c). Points and moves are the same tuples used by
+# game_rules, so moves can be passed between the two engines unchanged.
+###########################################################################
+
+# Cached per board size: (all squares mask, ((shift, origin mask), ...)) where
+# the origin mask holds the squares that can jump two squares in that direction
+_GEOMETRY = {}
+
+
+class BitBoard(object):
+    """ A Konane board stored as one integer bitmask per colour. """
+    __slots__ = ('rows', 'cols', 'x', 'o')
+
+    def __init__(self, rows, cols, x=0, o=0):
+        self.rows, self.cols = rows, cols
+        self.x, self.o = x, o
+
+    def __eq__(self, other):
+        return isinstance(other, BitBoard) and (self.rows, self.cols, self.x, self.o) == (other.rows, other.cols, other.x, other.o)
+
+    def __hash__(self):
+        return hash((self.rows, self.cols, self.x, self.o))
+
+    def __repr__(self):
+        return "BitBoard(" + game_rules.linearizeBoard(toList(self)).replace(" ", ".") + ")"
+
+    def copy(self):
+        return BitBoard(self.rows, self.cols, self.x, self.o)
+
+    def pieces(self, symbol):
+        return self.x if symbol == 'x' else self.o
+
+
+def _geometry(rows, cols):
+    geometry = _GEOMETRY.get((rows, cols))
+    if geometry is None:
+        def mask(rowRange, colRange):
+            return sum(1 << (r * cols + c) for r in rowRange for c in colRange)
+        full = (1 << (rows * cols)) - 1
+        # up, down, left, right
+        directions = ((-cols, mask(range(2, rows), range(cols)))
+                    , (cols, mask(range(rows - 2), range(cols)))
+                    , (-1, mask(range(rows), range(2, cols)))
+                    , (1, mask(range(rows), range(cols - 2))))
+        geometry = _GEOMETRY[(rows, cols)] = (full, directions)
+    return geometry
+
+
+def _bit(board, point):
+    return 1 << (point[0] * board.cols + point[1])
+
+
+def _popCount(bits):
+    return bin(bits).count('1')
+
+
+def makeBoard(rows, cols):
+    return fromList(game_rules.makeBoard(rows, cols))
+
+
+def fromList(board):
+    rows, cols = len(board), len(board[0])
+    x = o = 0
+    for r in range(rows):
+        for c in range(cols):
+            if board[r][c] == 'x': x |= 1 << (r * cols + c)
+            elif board[r][c] == 'o': o |= 1 << (r * cols + c)
+    return BitBoard(rows, cols, x, o)
+
+
+def toList(board):
+    return [[pieceAt(board, (r, c)) for c in range(board.cols)] for r in range(board.rows)]
+
+
+def emptyMask(board):
+    return _geometry(board.rows, board.cols)[0] & ~(board.x | board.o)
+
+
+def pieceAt(board, point):
+    bit = _bit(board, point)
+    if board.x & bit: return 'x'
+    if board.o & bit: return 'o'
+    return ' '
+
+
+def countPieces(board, piece):
+    if piece == 'x': return _popCount(board.x)
+    if piece == 'o': return _popCount(board.o)
+    if piece == ' ': return _popCount(emptyMask(board))
+    return 0
+
+
+def getEmptySquares(board):
+    return set(divmod(i, board.cols) for i in range(board.rows * board.cols) if not (board.x | board.o) >> i & 1)
+
+
+def isInitialMove(board):
+    return countPieces(board, ' ') < 2
+
+
+def getFirstMovesForX(board):
+    return set(filter(lambda pt: pieceAt(board, pt) == 'x', game_rules.getCorners(toList(board)).union(game_rules.getMiddles(toList(board)))))
+
+
+def getFirstMovesForO(board):
+    r, c = getEmptySquares(board).pop()
+    return set(pt for pt in [(r-1, c), (r+1, c), (r, c-1), (r, c+1)] if game_rules.onBoard(board.rows, board.cols, pt))
+
+
+def isLegalMove(board, player, move, loud=True):
+    if not game_rules.onBoard(board.rows, board.cols, move[1]):
+        if loud:
+            print("Pieces must stay on the board")
+        return False
+    if pieceAt(board, move[0]) != player:
+        if loud:
+            print("You can only move your own pieces")
+        return False
+    length = game_rules.moveLength(move)
+    if length % 2 == 1:
+        if loud:
+            print("Cannot move an odd number of squares")
+        return False
+    if length == 0:
+        if loud:
+            print("Cannot stay put")
+        return False
+    # The jumping piece only ever lands on squares it has not visited, so each
+    # hop can be checked against the original board without replaying it
+    other = board.o if player == 'x' else board.x
+    empty = emptyMask(board)
+    hasJumped = False
+    for jump in game_rules.interpolateMove(move):
+        if not (other & _bit(board, game_rules.midPoint(jump)) and empty & _bit(board, jump[1])):
+            if loud:
+                print("Illegal move")
+            return False
+        hasJumped = True
+    return hasJumped
+
+
+def _applyMove(board, player, move):
+    # No legality checks: the move must come from getLegalMoves or isLegalMove
+    captured = 0
+    for jump in game_rules.interpolateMove(move):
+        captured |= _bit(board, game_rules.midPoint(jump))
+    moved = (board.pieces(player) & ~_bit(board, move[0])) | _bit(board, move[1])
+    if player == 'x':
+        return BitBoard(board.rows, board.cols, moved, board.o & ~captured)
+    return BitBoard(board.rows, board.cols, board.x & ~captured, moved)
+
+
+def makePlayerMove(board, player, move):
+    if isLegalMove(board, player, move):
+        return _applyMove(board, player, move)
+    else:
+        return board
+
+
+def makeMove(board, move):
+    return makePlayerMove(board, pieceAt(board, move[0]), move)
+
+
+def getLegalMoves(board, symbol):
+    """Returns the legal moves for symbol, like game_rules.getLegalMoves.
+
+    Moves are ordered by origin square (row-major), then by direction
+    (up, down, left, right), then by the number of hops.
+    """
+    full, directions = _geometry(board.rows, board.cols)
+    empty = full & ~(board.x | board.o)
+    numEmpty = _popCount(empty)
+    if numEmpty == 0: return getFirstMovesForX(board)
+    elif numEmpty == 1: return getFirstMovesForO(board)
+
+    mine, other = (board.x, board.o) if symbol == 'x' else (board.o, board.x)
+    # for each direction, the pieces that have at least a single jump available
+    starts = []
+    for shift, mask in directions:
+        if shift > 0: starts.append(mine & mask & (other >> shift) & (empty >> 2 * shift))
+        else: starts.append(mine & mask & (other << -shift) & (empty << -2 * shift))
+    origins = starts[0] | starts[1] | starts[2] | starts[3]
+
+    cols = board.cols
+    moves = []
+    while origins:
+        low = origins & -origins
+        origins ^= low
+        origin = low.bit_length() - 1
+        src = divmod(origin, cols)
+        for (shift, mask), start in zip(directions, starts):
+            if not start & low: continue
+            pos = origin + 2 * shift
+            while True:
+                moves.append((src, divmod(pos, cols)))
+                if not (mask >> pos & 1 and other >> (pos + shift) & 1 and empty >> (pos + 2 * shift) & 1): break
+                pos += 2 * shift
+    return moves
+
+
+def randomPlayout(board, symbol, rng=random, max_plies=None):
+    """Plays uniformly random moves until the side to move is stuck.
+
+    Args:
+        board (BitBoard): The position to start from, past the opening moves.
+        symbol (str): The side to move first.
+        rng (random.Random, optional): Source of randomness. Defaults to the random module.
+        max_plies (int, optional): Stop after this many moves, with no loser.
+
+    Returns:
+        [BitBoard: final board, char: loser symbol, or None when stopped by max_plies]
+    """
+    player = symbol
+    moves = getLegalMoves(board, player)
+    plies = 0
+    while moves:
+        if plies == max_plies:
+            return [board, None]
+        plies += 1
+        board = _applyMove(board, player, rng.choice(moves))
+        player = 'o' if player == 'x' else 'x'
+        moves = getLegalMoves(board, player)
+    return [board, player]
+
+
+def linearizeBoard(board):
+    return game_rules.linearizeBoard(toList(board))
+
+
+def printBoard(board):
+    game_rules.printBoard(toList(board))
@@ -0,0 +1,45 @@
+import game_rules
+
+###########################################################################
+# Cheap board evaluators.
+# Every evaluator takes (board, symbol) and scores the board for symbol:
+# higher is better for symbol. Search code picks one by name through
+# getEvaluator, so new ones only need adding to EVALUATORS.
+###########################################################################
+
+def _other(symbol):
+    return 'o' if symbol == 'x' else 'x'
+
+
+def mobility(board, symbol):
+    """Minus the number of moves the opponent has (the original Player.h1)."""
+    return -game_rules.countLegalMoves(board, _other(symbol))
+
+
+def mobilityDiff(board, symbol):
+    """Our number of moves minus the opponent's."""
+    return game_rules.countLegalMoves(board, symbol) - game_rules.countLegalMoves(board, _other(symbol))
+
+
+def ownMobility(board, symbol):
+    """Our number of moves."""
+    return game_rules.countLegalMoves(board, symbol)
+
+
+def pieceDiff(board, symbol):
+    """Our number of pieces minus the opponent's."""
+    return game_rules.countPieces(board, symbol) - game_rules.countPieces(board, _other(symbol))
+
+
+EVALUATORS = {
+    "mobility": mobility,
+    "mobility_diff": mobilityDiff,
+    "own_mobility": ownMobility,
+    "piece_diff": pieceDiff,
+}
+
+
+def getEvaluator(name):
+    if name not in EVALUATORS:
+        raise ValueError(f"Invalid evaluator: {name}")
+    return EVALUATORS[name]
@@ -1,6 +1,7 @@
-from copy import deepcopy
+import time
 from player import HumanPlayer
 import game_rules
+import zobrist
 
 # Game state constants
 AWAITING_INITIAL_X = -1
@@ -11,7 +12,7 @@ X_VICTORY = 3
 O_VICTORY = 4
 
 class GameManager:
-    def __init__(self, rows, cols, player1, player2, script=None, verbose=False):
+    def __init__(self, rows, cols, player1, player2, script=None, verbose=False, log='game.log'):
         self.rows,self.cols = rows, cols
         self.p1, self.p2 = player1, player2
         self.verbose = verbose
@@ -19,28 +20,52 @@ class GameManager:
         self.moves = []
         if script is not None:
             self._load_script(script)
-        self.log = open('game.log', 'w')
+        # log is a file name, a file-like object to buffer the moves in (e.g. io.StringIO),
+        # or None to play headless without writing the moves anywhere
+        self.own_log = isinstance(log, str)
+        self.log = open(log, 'w') if self.own_log else log
 
     def reset(self):
         self.turn_number = 1
         self.state = AWAITING_INITIAL_X
         self.board = game_rules.makeBoard(self.rows, self.cols)
+        # seconds each move took, x's first move first
+        self.move_times = []
+        # legal moves of the side to move, worked out once per turn
+        self.legal_moves = []
 
     def interrupt(self, a, b):
         import sys
-        self.log.close()
+        self._closeLog()
+        self._closePlayers()
         sys.exit(1)
 
+    def _writeLog(self, move):
+        if self.log is not None:
+            self.log.write(str(move)+'\n')
+
+    def _closeLog(self):
+        if self.own_log:
+            self.log.close()
+
+    def _closePlayers(self):
+        # the players' process pools are kept from move to move, and stopped once the game is over
+        self.p1.close()
+        self.p2.close()
+
     def play(self, PB=True):
-        while self.state is not X_VICTORY and self.state is not O_VICTORY:
-            if self.moves:
-                move = self.moves.pop(0)
-                print('playing scripted move', move)
-                self._takeTurn(move, PB)
-            else:
-                self._takeTurn(PB=PB)
-            if self.verbose and PB: game_rules.printBoard(self.board)
-        self.log.close()
+        try:
+            while self.state is not X_VICTORY and self.state is not O_VICTORY:
+                if self.moves:
+                    move = self.moves.pop(0)
+                    print('playing scripted move', move)
+                    self._takeTurn(move, PB)
+                else:
+                    self._takeTurn(PB=PB)
+                if self.verbose and PB: game_rules.printBoard(self.board)
+        finally:
+            self._closePlayers()
+        self._closeLog()
 
     def GetTurn(self):
         if self.state == AWAITING_INITIAL_X or self.state == X_TURN: return self.p1.symbol
@@ -51,20 +76,28 @@ class GameManager:
         if self.state < 3: return None
         return 'X' if self.state == X_VICTORY else 'O'
 
+    def GetPositionKey(self):
+        return zobrist.hashBoard(self.board, self.GetTurn())
+
     def _takeTurn(self, move_pair=None, PB=True):
-        playerBoard = deepcopy(self.board)
+        # the board holds only strings, so copying the rows gives the player a full copy
+        playerBoard = [row[:] for row in self.board]
         old = self.state
 
-        if len(game_rules.getLegalMoves(self.board, self.GetTurn())) < 1:
+        self.legal_moves = game_rules.getLegalMoves(self.board, self.GetTurn())
+        if len(self.legal_moves) < 1:
             if self.state == X_TURN: self.state = O_VICTORY
             if self.state == O_TURN: self.state = X_VICTORY
             return
 
+        start = time.perf_counter()
         if self.state   == AWAITING_INITIAL_X: self._handleInitialX(playerBoard, self.board, move_pair, PB)
         elif self.state == AWAITING_INITIAL_O: self._handleInitialO(playerBoard, self.board, move_pair)
         elif self.state == X_TURN: self._handleTurnX(playerBoard, self.board, move_pair)
         elif self.state == O_TURN: self._handleTurnO(playerBoard, self.board, move_pair)
-        if self.state != old: self.turn_number += 1
+        if self.state != old:
+            self.move_times.append(time.perf_counter() - start)
+            self.turn_number += 1
 
     def _handleInitialX(self, playerBoard, board, move_pair, PB=True):
         #move = move_pair[0] if isinstance(self.p1, HumanPlayer) else self.p1.selectInitialX(playerBoard)
@@ -73,16 +106,16 @@ class GameManager:
         move = move_pair[0] if move_pair is not None else self.p1.selectInitialX(playerBoard)
         if PB:
             print('move', move)
-        if move in game_rules.getFirstMovesForX(board):
-            self.log.write(str(move)+'\n')
+        if move in self.legal_moves:
+            self._writeLog(move)
             self.board[move[0]][move[1]] = " "
             self.state = AWAITING_INITIAL_O
 
     def _handleInitialO(self, playerBoard, board, move_pair):
         #move = move_pair[0] if isinstance(self.p2, HumanPlayer) else self.p2.selectInitialO(playerBoard)
         move = move_pair[0] if move_pair is not None else self.p2.selectInitialO(playerBoard)
-        if move in game_rules.getFirstMovesForO(board):
-            self.log.write(str(move)+'\n')
+        if move in self.legal_moves:
+            self._writeLog(move)
             self.board[move[0]][move[1]] = " "
             self.state = X_TURN
 
@@ -90,20 +123,30 @@ class GameManager:
         #move = move_pair if isinstance(self.p1, HumanPlayer) else self.p1.getMove(playerBoard)
         move = move_pair if move_pair is not None else self.p1.getMove(playerBoard)
         if not move: self.state = O_VICTORY
-        elif game_rules.isLegalMove(board, 'x', move, False):
-            self.log.write(str(move)+'\n')
-            self.board = game_rules.makeMove(board, move)
+        elif self._isLegal(board, 'x', move):
+            self._writeLog(move)
+            self._applyMove(board, move)
             self.state = O_TURN
 
     def _handleTurnO(self, playerBoard, board, move_pair):
         #move = move_pair if isinstance(self.p2, HumanPlayer) else self.p2.getMove(playerBoard)
         move = move_pair if move_pair is not None else self.p2.getMove(playerBoard)
         if not move: self.state = X_VICTORY
-        elif game_rules.isLegalMove(board, 'o', move, False):
-            self.log.write(str(move)+'\n')
-            self.board = game_rules.makeMove(board, move)
+        elif self._isLegal(board, 'o', move):
+            self._writeLog(move)
+            self._applyMove(board, move)
             self.state = X_TURN
 
+    def _applyMove(self, board, move):
+        # the move passed _isLegal, so it is played on a copy without checking it again
+        self.board = [row[:] for row in board]
+        game_rules.applyMove(self.board, move)
+
+    def _isLegal(self, board, symbol, move):
+        # moves from getLegalMoves are found in the list worked out this turn,
+        # anything spelt differently (e.g. lists instead of tuples) is checked in full
+        return move in self.legal_moves or game_rules.isLegalMove(board, symbol, move, False)
+
     def _load_script(self, script):
         with open(script, 'r') as f:
             for each in f:
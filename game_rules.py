@@ -1,5 +1,8 @@
-from copy import deepcopy
 import math
+import re
+
+# A piece followed by one or more (opponent, empty square) pairs in a row or column
+_JUMP_PATTERNS = {'x': re.compile("x(?=((?:o )+))"), 'o': re.compile("o(?=((?:x )+))")}
 
 def makeBoard(rows, cols):
     return [['x' if (r+c)%2 == 0 else 'o' for c in range(cols)] for r in range(rows)]
@@ -9,13 +12,31 @@ def makeMove(board, move):
 
 def makePlayerMove(board, player, move):
     if isLegalMove(board, player, move):
-        newBoard = deepcopy(board)
+        newBoard = [row[:] for row in board]
         for jump in interpolateMove(move):
             _makeJump(newBoard, jump)
         return newBoard
     else:
         return board
 
+def applyMove(board, move):
+    # Plays a legal move on board in place and returns the record undoMove needs
+    player = board[move[0][0]][move[0][1]]
+    other = 'o' if player == 'x' else 'x'
+    captured = [midPoint(jump) for jump in interpolateMove(move)]
+    for r, c in captured:
+        board[r][c] = " "
+    board[move[0][0]][move[0][1]] = " "
+    board[move[1][0]][move[1][1]] = player
+    return (move, player, other, captured)
+
+def undoMove(board, undo):
+    move, player, other, captured = undo
+    board[move[1][0]][move[1][1]] = " "
+    board[move[0][0]][move[0][1]] = player
+    for r, c in captured:
+        board[r][c] = other
+
 def _makeJump(board, jump):
     mid = midPoint(jump)
     board[mid[0]][mid[1]] = " "
@@ -45,19 +66,16 @@ def isLegalMove(board, player, move, loud=True):
         return False
     other = 'o' if player == 'x' else 'x'
     hasJumped = False
+    # The piece only lands on squares further along the line, so every hop
+    # after the first can be checked against the unchanged board
     for jump in interpolateMove(move):
-        if not isLegalJump(board, player, other, jump):
+        if pieceAt(board, midPoint(jump)) != other or pieceAt(board, jump[1]) != " ":
             if loud:
                 print("Illegal move")
             return False
-        board = deepcopy(board)
-        _makeJump(board, jump)
         hasJumped = True
     return hasJumped
 
-def isLegalJump(board, player, other, jump):
-    return pieceAt(board, jump[0]) == player and pieceAt(board, midPoint(jump)) == other and pieceAt(board, jump[1]) == " "
-
 def isInitialMove(board):
     return countPieces(board, ' ') < 2
 
@@ -120,14 +138,45 @@ def getFirstMovesForX(board):
 def getFirstMovesForO(board):
     return getNeighbors(board, getEmptySquares(board).pop())
 
+def generateJumps(board, origin, player, other):
+    # Walk outward from origin in each direction, yielding every square the
+    # piece can stop on. Squares along a walk are never revisited, so the
+    # board does not need to be updated between hops.
+    rows, cols = len(board), len(board[0])
+    for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        r, c = origin
+        while 0 <= r + 2*dr < rows and 0 <= c + 2*dc < cols and board[r+dr][c+dc] == other and board[r+2*dr][c+2*dc] == " ":
+            r, c = r + 2*dr, c + 2*dc
+            yield (r, c)
+
 def getLegalMoves(board, symbol):
     empties = getEmptySquares(board)
     if len(empties) == 0: return getFirstMovesForX(board)
     elif len(empties) == 1: return getFirstMovesForO(board)
     else:
-        mine = [(r, c) for r in range(len(board)) for c in range(len(board[0])) if pieceAt(board, (r, c)) == symbol]
-        allMoves = [(o, d) for o in mine for d in empties]
-        return [move for move in allMoves if isLegalMove(board, symbol, move, False)]
+        other = 'o' if symbol == 'x' else 'x'
+        # Destinations are listed in the iteration order of the empty square set,
+        # the order the old (origin x empty square) scan produced them in
+        rank = {square: i for i, square in enumerate(empties)}
+        moves = []
+        for r in range(len(board)):
+            for c in range(len(board[0])):
+                if board[r][c] == symbol:
+                    destinations = sorted(generateJumps(board, (r, c), symbol, other), key=rank.__getitem__)
+                    moves.extend(((r, c), d) for d in destinations)
+        return moves
+
+def countLegalMoves(board, symbol):
+    # Same as len(getLegalMoves(board, symbol)) without building the moves.
+    # Every row and column is scanned as a string in both directions; a piece
+    # followed by k (opponent, empty) pairs has k moves that way.
+    lines = ["".join(row) for row in board]
+    empties = sum(line.count(" ") for line in lines)
+    if empties == 0: return len(getFirstMovesForX(board))
+    elif empties == 1: return len(getFirstMovesForO(board))
+    lines += ["".join(col) for col in zip(*board)]
+    jumps = _JUMP_PATTERNS[symbol]
+    return sum(len(run) for line in lines for run in jumps.findall(line) + jumps.findall(line[::-1])) // 2
 
 def linearizeBoard(board):
     return "".join(["".join(row) for row in board])
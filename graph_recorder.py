@@ -0,0 +1,113 @@
+import json
+import os
+import networkx as nx
+
+###########################################################################
+# Streaming record of the MCTS process drawn with make_graph.
+# Every action of one move is written as it happens to a JSON lines file,
+# one event per line:
+#   {"op": "add_node", "id": 3, "board": "x o ...", "stats": [value, visits, ucb, player]}
+#   {"op": "add_edge", "parent": 1, "child": 3}
+#   {"op": "update", "id": 3, "stats": [value, visits, ucb, player]}
+#   {"op": "del", "id": 3}
+# A node's board never changes, so it is written once, and an update is only
+# written when the node's stats differ from the last ones written for it.
+# GraphReplay reads a log back one event at a time to draw it (see render.py).
+###########################################################################
+
+def logPath(directory, index):
+    return os.path.join(directory, "MCTS Process " + str(index) + ".jsonl")
+
+
+def labels(board, stats):
+    """Returns the text drawn next to a node, from its board string and stats."""
+    value, visits, ucb, player = stats
+    return [board, "Val: " + str(value), "Visits: " + str(visits), "Ucb: " + str(ucb), "Player: " + str(player)]
+
+
+class GraphRecorder(object):
+    """ Writes the actions of one MCTS move to a JSON lines file. """
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = open(path, "w")
+        self.ids = {}       # node -> id in the log
+        self.stats = {}     # id -> last stats written
+        self.next_id = 0
+        self.events = 0
+
+    def __str__(self):
+        return "{GraphRecorder " + self.path + ", Events: " + str(self.events) + "}"
+
+    def _write(self, event):
+        self.file.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self.events += 1
+
+    def addNode(self, node, board, stats):
+        node_id = self.ids[node] = self.next_id
+        self.next_id += 1
+        self.stats[node_id] = stats
+        self._write({"op": "add_node", "id": node_id, "board": board, "stats": stats})
+
+    def addEdge(self, parent, child):
+        self._write({"op": "add_edge", "parent": self.ids[parent], "child": self.ids[child]})
+
+    def update(self, node, stats):
+        node_id = self.ids[node]
+        if self.stats[node_id] != stats:
+            self.stats[node_id] = stats
+            self._write({"op": "update", "id": node_id, "stats": stats})
+
+    def delete(self, node):
+        node_id = self.ids.pop(node)
+        del self.stats[node_id]
+        self._write({"op": "del", "id": node_id})
+
+    def close(self):
+        self.file.close()
+        self.ids = {}
+        self.stats = {}
+
+
+def readEvents(path):
+    with open(path) as file:
+        for line in file:
+            yield json.loads(line)
+
+
+class GraphReplay(object):
+    """ The tree and node labels of a log, as of the last event applied. """
+    def __init__(self, path):
+        self.events = readEvents(path)
+        self.applied = 0
+        # counts the events that changed the nodes or edges, so a drawing knows when to lay out again
+        self.shape = 0
+        self.tree = nx.DiGraph()
+        self.boards = {}
+        self.labels = {}
+
+    def apply(self, event):
+        op = event["op"]
+        if op != "update":
+            self.shape += 1
+        if op == "add_node":
+            self.tree.add_node(event["id"])
+            self.boards[event["id"]] = event["board"]
+            self.labels[event["id"]] = labels(event["board"], event["stats"])
+        elif op == "add_edge":
+            self.tree.add_edge(event["parent"], event["child"])
+        elif op == "update":
+            self.labels[event["id"]] = labels(self.boards[event["id"]], event["stats"])
+        elif op == "del":
+            self.tree.remove_node(event["id"])
+            del self.boards[event["id"]]
+            del self.labels[event["id"]]
+
+    def seek(self, frame):
+        """Applies events until frame (0 based) has been applied. Asking for a frame
+        already applied does nothing, as the drawing code may ask for a frame twice."""
+        while self.applied <= frame:
+            self.apply(next(self.events))
+            self.applied += 1
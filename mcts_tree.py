@@ -0,0 +1,150 @@
+import math
+import sys
+from array import array
+import numpy as np
+
+###########################################################################
+# Array-backed MCTS tree.
+# Instead of one Node object per position (with its own copied board and
+# children list), every node is an index into a few typed arrays. The
+# children of a node are created together, so they sit next to each other:
+# first_child[n] .. first_child[n] + num_children[n] - 1.
+# Boards are not stored at all. A search copies the root board once per
+# simulation and plays the moves on the way down, which is cheap next to
+# the rollout that follows.
+###########################################################################
+
+# the ucb1 score of a node that has not been visited yet
+UNVISITED = float('inf')
+
+# below this many children a plain loop beats the overhead of a numpy call.
+# A batched select costs about 10us however many children there are, the loop
+# about 0.4us a child, for both stores. Konane rarely gives that many moves on
+# boards up to 12x12 (at most ~20 on 8x8), and often does on 16x16.
+VECTOR_MIN_CHILDREN = 48
+
+PLAYERS = ('x', 'o')
+
+
+def ucbScores(values, visits, parent_visits, c):
+    """Returns the ucb1 scores of a set of siblings in one numpy operation.
+
+    The arithmetic is done in the same order as Node.ucb1, so the scores
+    are bit-for-bit the ones the scalar code would get.
+
+    Args:
+        values (np.ndarray): value of each child.
+        visits (np.ndarray): visits of each child.
+        parent_visits (int): visits of their parent.
+        c (float): exploration constant.
+
+    Returns:
+        np.ndarray: the score of each child, UNVISITED for children with no visits.
+    """
+    if parent_visits == 0:
+        return np.full(len(visits), UNVISITED)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = values / visits + c * np.sqrt(math.log(parent_visits) / visits)
+    scores[visits == 0] = UNVISITED
+    return scores
+
+
+class ArrayTree(object):
+    """ An MCTS tree stored as a struct of arrays, node 0 is the root. """
+    def __init__(self, board, player):
+        self.rows, self.cols = len(board), len(board[0])
+        self.visits = array('i')
+        self.values = array('i')
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.num_children = array('i')
+        # origin and destination square indices packed into one int
+        self.moves = array('i')
+        # 0 for 'x', 1 for 'o', same meaning as Node.player
+        self.players = array('b')
+        self._add(-1, -1, PLAYERS.index(player))
+
+    def __len__(self):
+        return len(self.visits)
+
+    def __str__(self):
+        return "{ArrayTree nodes = " + str(len(self)) + ", Bytes: " + str(self.memoryUsage()) + "}"
+
+    def _add(self, parent, move, player):
+        self.visits.append(0)
+        self.values.append(0)
+        self.parent.append(parent)
+        self.first_child.append(0)
+        self.num_children.append(0)
+        self.moves.append(move)
+        self.players.append(player)
+
+    def _arrays(self):
+        return (self.visits, self.values, self.parent, self.first_child, self.num_children, self.moves, self.players)
+
+    def bytesPerNode(self) -> int:
+        """Bytes each node takes in the arrays, not counting spare capacity."""
+        return sum(a.itemsize for a in self._arrays())
+
+    def memoryUsage(self) -> int:
+        """Bytes currently allocated by the arrays, including spare capacity."""
+        return sum(sys.getsizeof(a) for a in self._arrays())
+
+    def packMove(self, move) -> int:
+        (r0, c0), (r1, c1) = move
+        return (r0 * self.cols + c0) * self.rows * self.cols + r1 * self.cols + c1
+
+    def move(self, node):
+        origin, dest = divmod(self.moves[node], self.rows * self.cols)
+        return (divmod(origin, self.cols), divmod(dest, self.cols))
+
+    def player(self, node) -> str:
+        return PLAYERS[self.players[node]]
+
+    def expand(self, node, legal_moves):
+        """Adds one child per move, like MonteCarloPlayer.expand."""
+        self.first_child[node] = len(self)
+        self.num_children[node] = len(legal_moves)
+        player = 1 - self.players[node]
+        for move in legal_moves:
+            self._add(node, self.packMove(move), player)
+
+    def ucb1(self, node, c) -> float:
+        parent = self.parent[node]
+        if self.visits[node] == 0 or parent < 0 or self.visits[parent] == 0:
+            return UNVISITED
+        return self.values[node] / self.visits[node] + c * math.sqrt(math.log(self.visits[parent]) / self.visits[node])
+
+    def select(self, node, c) -> int:
+        """Returns the child of node with the highest ucb1, the first one on ties."""
+        first = self.first_child[node]
+        visits, values = self.visits, self.values
+        parent_visits = visits[node]
+        num_children = self.num_children[node]
+        if num_children >= VECTOR_MIN_CHILDREN:
+            # zero-copy views of the children's slots; argmax picks the first best like the loop
+            offset = first * visits.itemsize
+            child_visits = np.frombuffer(visits, dtype=np.intc, count=num_children, offset=offset)
+            child_values = np.frombuffer(values, dtype=np.intc, count=num_children, offset=offset)
+            return first + int(np.argmax(ucbScores(child_values, child_visits, parent_visits, c)))
+        log_visits = math.log(parent_visits) if parent_visits > 0 else 0.0
+        best_score = -UNVISITED
+        best_child = -1
+        for child in range(first, first + num_children):
+            if visits[child] == 0 or parent_visits == 0:
+                score = UNVISITED
+            else:
+                score = values[child] / visits[child] + c * math.sqrt(log_visits / visits[child])
+            if score > best_score:
+                best_score = score
+                best_child = child
+        return best_child
+
+    def backpropagate(self, node, loser):
+        """Updates node and its ancestors with a simulation result, like Node.update."""
+        loser = PLAYERS.index(loser)
+        while node >= 0:
+            self.visits[node] += 1
+            if self.players[node] == loser:
+                self.values[node] += 1
+            node = self.parent[node]
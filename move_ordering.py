@@ -0,0 +1,53 @@
+import game_rules
+
+###########################################################################
+# Move ordering for alpha-beta search.
+# Alpha-beta prunes the most when the best move is searched first, so moves
+# are sorted by how likely they are to cause a cutoff:
+#   1. the best move already known for the position (previous iteration or
+#      transposition table entry)
+#   2. killer moves, which caused a cutoff at the same ply elsewhere in the tree
+#   3. history score, which grows every time a move causes a cutoff
+#   4. number of pieces captured, so multi-jumps come before single jumps
+# Moves that tie keep the order they were generated in.
+###########################################################################
+
+class MoveOrderer(object):
+    """ Killer and history tables shared by every node of a search. """
+    def __init__(self, num_killers=2):
+        self.num_killers = num_killers
+        self.killers = {}   # ply -> most recent cutoff moves at that ply, newest first
+        self.history = {}   # move -> cutoff score
+
+    def newSearch(self):
+        """Forgets the killers of the previous search and halves the history scores."""
+        self.killers = {}
+        self.history = {move: score // 2 for move, score in self.history.items() if score > 1}
+
+    def order(self, moves: list, ply: int, bestMove=None) -> list:
+        """Returns moves sorted so the most promising come first.
+
+        Args:
+            moves (list): The legal moves of the position.
+            ply (int): Distance of the position from the root of the search.
+            bestMove (tuple, optional): Move to put first if it is in moves.
+
+        Returns:
+            list: A new list holding the same moves.
+        """
+        killers = self.killers.get(ply, [])
+        history = self.history
+        def key(move):
+            killer = killers.index(move) if move in killers else len(killers)
+            return (move != bestMove, killer, -history.get(move, 0), -game_rules.moveLength(move))
+        return sorted(moves, key=key)
+
+    def recordCutoff(self, move, ply: int, depth: int):
+        """Remembers a move that caused a beta cutoff with depth plies left to search."""
+        killers = self.killers.setdefault(ply, [])
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[self.num_killers:]
+        # deep cutoffs save more work, so they count for more
+        self.history[move] = self.history.get(move, 0) + depth * depth
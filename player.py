@@ -1,14 +1,23 @@
 import math
 import signal
+import time
 from typing import Optional
 from tqdm import tqdm
 import game_manager
 import game_rules
+import bitboard
+import graph_recorder
+import batch_rollout
+import transposition
+import move_ordering
+import evaluation
+import mcts_tree
+import zobrist
 import random
-import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+import multiprocessing
 import textwrap
+from array import array
+import numpy as np
 
 ###########################################################################
 # Explanation of the types:
@@ -23,9 +32,29 @@ import textwrap
 NEG_INF = -1000000000
 POS_INF = 1000000000
 
+# when a MonteCarloPlayer tree outgrows max_tree_size it is pruned down to this fraction of it
+PRUNE_TO = 0.75
+
+# with only max_nodes, a search runs at most this many simulations per node of the budget
+SIMULATIONS_PER_NODE = 10
+
+class SearchTimeout(Exception):
+    """ Raised inside a search when its time budget has run out. """
+    pass
+
 class Player(object):
     """ This is the player interface that is consumed by the GameManager. """
-    def __init__(self, symbol): self.symbol = symbol # 'x' or 'o'
+    def __init__(self, symbol, evaluator="mobility"):
+        self.symbol = symbol # 'x' or 'o'
+        self.evaluator_name = evaluator
+        self.evaluator = evaluation.getEvaluator(evaluator)
+        # move ordering of the alpha-beta searches, set up by the players that search,
+        # and their counters: nodes searched and beta cutoffs during the last getMove
+        self.orderer = None
+        self.nodes = 0
+        self.cutoffs = 0
+        # process pool of the players that search with workers, made on first use and kept for the game
+        self.pool = None
 
     def __str__(self): return str(type(self))
 
@@ -35,14 +64,44 @@ class Player(object):
     def getMove(self, board): pass
 
     def h1(self, board, symbol):
-        return -len(game_rules.getLegalMoves(board, 'o' if self.symbol == 'x' else 'x'))
+        return -game_rules.countLegalMoves(board, 'o' if self.symbol == 'x' else 'x')
+
+    def evaluate(self, board):
+        # scores board for self.symbol with the evaluator picked by name, h1 by default
+        return self.evaluator(board, self.symbol)
+
+    def recordCutoff(self, move, ply, depth):
+        # called by the alpha-beta searches on a beta cutoff
+        self.cutoffs += 1
+        if self.orderer is not None:
+            self.orderer.recordCutoff(move, ply, depth)
+
+    def close(self):
+        # called by the GameManager at the end of a game, stops the process pool if there is one
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
 
 
 # This class has been replaced with the code for a deterministic player.
 class AlphaBetaPlayer(Player):
-    def __init__(self, symbol, depth):
-        super(AlphaBetaPlayer, self).__init__(symbol)
+    def __init__(self, symbol, depth, tt_size=0, max_time=None, ordering=False, evaluator="mobility", workers=1):
+        super(AlphaBetaPlayer, self).__init__(symbol, evaluator)
+        if max_time is not None and workers > 1:
+            raise ValueError("workers need a fixed depth search, without max_time")
         self.depth = depth
+        # kept for the whole game, so positions searched on earlier moves are reused
+        self.tt = transposition.TranspositionTable(tt_size) if tt_size > 0 else None
+        # with max_time, depth is only the deepest iteration (None for no limit)
+        self.max_time = max_time
+        self.deadline = None
+        self.completed_depth = 0
+        self.orderer = move_ordering.MoveOrderer() if ordering else None
+        # processes used to search the root moves of a fixed depth search
+        self.workers = workers
+        # best root value shared with the pool's processes, see ParallelRootSearch
+        self.root_alpha = None
 
     # Leave these two functions alone.
     def selectInitialX(self, board): return (0,0)
@@ -53,11 +112,90 @@ class AlphaBetaPlayer(Player):
 
     # Edit this one here. :)
     def getMove(self, board) -> tuple:
+        if self.tt is not None:
+            self.tt.newSearch()
+        if self.orderer is not None:
+            self.orderer.newSearch()
+        self.nodes = 0
+        self.cutoffs = 0
+        if self.max_time is not None:
+            return self.IterativeDeepeningSearch(board)[1]
+        if self.workers > 1:
+            return self.ParallelRootSearch(board)[1]
         return self.AlphaBetaSearch(board)[1]
 
-    def AlphaBetaSearch(self, board, a=NEG_INF, b=POS_INF, depth=None, symbol=None, maximizing_player=True) -> tuple:
+    def ParallelRootSearch(self, board) -> tuple:
+        """
+        Searches the root moves across self.workers processes (young brothers wait).
+        The first root move is searched here to get an alpha bound, then the rest are
+        handed out to a process pool. Workers share the best value found so far and
+        search with alpha just below it, so a move that ties the best still gets its
+        exact value and the first best move wins, exactly as in AlphaBetaSearch.
+        This relies on the evaluator returning integers. The pool is made on the
+        first search and kept until close().
+        args:
+            board: the board to evaluate
+
+        returns:
+            a tuple of (value, move), the same as AlphaBetaSearch(board) without move ordering
+        """
+        legalMoves = game_rules.getLegalMoves(board, self.symbol)
+        if len(legalMoves) < 2 or self.depth == 0:
+            return self.AlphaBetaSearch(board)
+        other = 'o' if self.symbol == 'x' else 'x'
+        undo = game_rules.applyMove(board, legalMoves[0])
+        bestMove = (self.AlphaBetaSearch(board, NEG_INF, POS_INF, self.depth - 1, other, False)[0], legalMoves[0])
+        game_rules.undoMove(board, undo)
+
+        config = (self.symbol, self.depth, self.tt.size if self.tt is not None else 0, self.orderer is not None, self.evaluator_name)
+        if self.pool is None:
+            context = multiprocessing.get_context()
+            self.root_alpha = context.Value('q', 0)
+            self.pool = context.Pool(self.workers, initializer=_initRootWorker, initargs=(self.root_alpha,))
+        self.root_alpha.value = bestMove[0]
+        jobs = [(config, board, move) for move in legalMoves[1:]]
+        for move, (val, exact, nodes) in zip(legalMoves[1:], self.pool.imap(_searchRootMove, jobs)):
+            self.nodes += nodes
+            # moves come back in order, so only a strictly better exact value replaces the best
+            if exact and val > bestMove[0]:
+                bestMove = (val, move)
+        return bestMove
+
+    def IterativeDeepeningSearch(self, board) -> tuple:
+        """
+        Searches to depth 1, 2, ... until self.max_time seconds have passed or self.depth is reached.
+        Each iteration searches the best move of the previous one first. Every move captures
+        a piece, so the game ends within 2 * min(pieces of each side) + 1 plies; a search
+        that deep is exact, and the deepening stops there.
+        args:
+            board: the board to evaluate
+
+        returns:
+            a tuple of (value, move) from the deepest iteration that finished in time
+        """
+        legalMoves = game_rules.getLegalMoves(board, self.symbol)
+        if len(legalMoves) == 0:
+            return (self.evaluate(board), None)
+        # if not even depth 1 finishes, the first legal move is all we have
+        bestMove = (NEG_INF, legalMoves[0])
+        plies = 2 * min(game_rules.countPieces(board, 'x'), game_rules.countPieces(board, 'o')) + 1
+        maxDepth = min(self.depth, plies) if self.depth else plies
+        self.completed_depth = 0
+        self.deadline = time.time() + self.max_time
+        try:
+            for depth in range(1, maxDepth + 1):
+                bestMove = self.AlphaBetaSearch(board, depth=depth, firstMove=bestMove[1])
+                self.completed_depth = depth
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+        return bestMove
+
+    def AlphaBetaSearch(self, board, a=NEG_INF, b=POS_INF, depth=None, symbol=None, maximizing_player=True, key=None, firstMove=None, ply=0) -> tuple:
         """
         Returns the maximum/minimum value of the board, depending on isMaximizing.
+        Moves are played and taken back on board in place, so it is unchanged on return.
         args:
             board: the board to evaluate
             a: the alpha value
@@ -65,6 +203,9 @@ class AlphaBetaPlayer(Player):
             depth: the depth of the search
             symbol: the symbol to evaluate
             maximizing_player: a boolean value indicating whether to perform a max or min operation
+            key: the zobrist key of board with symbol to move, only used with a transposition table
+            firstMove: a move to search before the others, if it is legal
+            ply: the distance from the root of the search, used by move ordering
 
         returns:
             a tuple of (value, move)
@@ -74,35 +215,93 @@ class AlphaBetaPlayer(Player):
             depth = self.depth
         if symbol is None:
             symbol = self.symbol
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout()
+        self.nodes += 1
+        # look the position up in the transposition table
+        entry = None
+        if self.tt is not None:
+            if key is None:
+                key = zobrist.hashBoard(board, symbol)
+            entry = self.tt.probe(key)
+            if entry is not None and entry.depth >= depth:
+                if entry.flag == transposition.EXACT \
+                        or (entry.flag == transposition.LOWER and entry.value >= b) \
+                        or (entry.flag == transposition.UPPER and entry.value <= a):
+                    return (entry.value, entry.move)
+            alpha, beta = a, b
         # set best value
         if maximizing_player:
             bestMove = (NEG_INF, None)
         else:
             bestMove = (POS_INF, None)
-        legalMoves = game_rules.getLegalMoves(board, symbol)
+        # a leaf is scored without generating its moves
+        legalMoves = game_rules.getLegalMoves(board, symbol) if depth > 0 else []
         # If no legal moves or end of tree, return
         if len(legalMoves) == 0 or depth == 0:
-            return (self.h1(board, symbol), None)
+            bestMove = (self.evaluate(board), None)
+            if self.tt is not None:
+                self.tt.store(key, depth, bestMove[0], transposition.EXACT, None)
+            return bestMove
+        if self.orderer is not None:
+            if firstMove is None and entry is not None:
+                firstMove = entry.move
+            legalMoves = self.orderer.order(legalMoves, ply, firstMove)
+        elif firstMove in legalMoves:
+            legalMoves.remove(firstMove)
+            legalMoves.insert(0, firstMove)
         # loop through all legal moves
         for i in range(len(legalMoves)):
-            nextMove = game_rules.makeMove(board, legalMoves[i])
-            val = self.AlphaBetaSearch(nextMove, a, b, depth - 1, 'o' if symbol == 'x' else 'x', not maximizing_player)[0]
+            if self.tt is None:
+                childKey, undo = None, game_rules.applyMove(board, legalMoves[i])
+            else:
+                childKey, undo = zobrist.applyMove(board, legalMoves[i], key)
+            try:
+                val = self.AlphaBetaSearch(board, a, b, depth - 1, 'o' if symbol == 'x' else 'x', not maximizing_player, childKey, None, ply + 1)[0]
+            finally:
+                # also runs on a timeout, so the caller's board is always restored
+                game_rules.undoMove(board, undo)
             # get max/min value
             if maximizing_player:
                 if bestMove[0] < val:
                     bestMove = (val, legalMoves[i])
                 if bestMove[0] >= b:
-                    return bestMove
+                    self.recordCutoff(legalMoves[i], ply, depth)
+                    break
                 a = max(a, bestMove[0])
             else:
                 if bestMove[0] > val:
                     bestMove = (val, legalMoves[i])
                 if bestMove[0] <= a:
-                    return bestMove
+                    self.recordCutoff(legalMoves[i], ply, depth)
+                    break
                 b = min(b, bestMove[0])
+        if self.tt is not None:
+            self.tt.store(key, depth, bestMove[0], transposition.boundFlag(bestMove[0], alpha, beta), bestMove[1])
         return bestMove
 
 
+# shared best root value of the running ParallelRootSearch, set in each worker process
+_rootAlpha = None
+
+def _initRootWorker(alpha):
+    global _rootAlpha
+    _rootAlpha = alpha
+
+def _searchRootMove(job):
+    # Searches one root move in a worker process and returns (value, exact, nodes)
+    (symbol, depth, tt_size, ordering, evaluator), board, move = job
+    player = AlphaBetaPlayer(symbol, depth, tt_size, None, ordering, evaluator)
+    # one below the best so far, so a move that ties it still gets an exact value
+    a = _rootAlpha.value - 1
+    game_rules.applyMove(board, move)
+    val = player.AlphaBetaSearch(board, a, POS_INF, depth - 1, 'o' if symbol == 'x' else 'x', False)[0]
+    if val > a:
+        with _rootAlpha.get_lock():
+            _rootAlpha.value = max(_rootAlpha.value, val)
+    return (val, val > a, player.nodes)
+
+
 class Node:
     def __init__(self, state, c, player, parent=None, move=None):
         self.c_param = c
@@ -110,9 +309,37 @@ class Node:
         self.parent = parent
         self.move = move
         self.children = []
-        self.visits = 0
-        self.value = 0
+        # visits and value of each child, in the same order, so select can score them all in one numpy operation
+        self.child_visits = array('i')
+        self.child_values = array('i')
+        # (parent, index) of every slot holding this node's stats, one per parent it was added to
+        self.slots = []
+        self._visits = 0
+        self._value = 0
         self.player = player
+        # zobrist key of (state, player), only set when MonteCarloPlayer shares transpositions
+        self.key = None
+
+    # setting visits or value also updates the node's slots in its parents
+    @property
+    def visits(self):
+        return self._visits
+
+    @visits.setter
+    def visits(self, visits):
+        self._visits = visits
+        for parent, index in self.slots:
+            parent.child_visits[index] = visits
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        for parent, index in self.slots:
+            parent.child_values[index] = value
 
     def __str__(self):
         return "{Board = " + str(self.state) + ", C: " + str(self.c_param) + ", Player = " + str(self.player) + ", Parent = " + str(self.parent) + ", Move: " + str(self.move) + ", Children: " + str(len(self.children)) + "}"
@@ -121,14 +348,33 @@ class Node:
         return self.__str__()
 
     def add_child(self, child):
+        child.slots.append((self, len(self.children)))
         self.children.append(child)
+        self.child_visits.append(child.visits)
+        self.child_values.append(child.value)
+
+    def detach(self):
+        # make the node a root, with no link back to its parents so they can be freed
+        self.parent = None
+        self.slots = []
+
+    def clear_children(self):
+        # drop the children, and their slots in this node
+        for child in self.children:
+            child.slots = [slot for slot in child.slots if slot[0] is not self]
+        self.children = []
+        self.child_visits = array('i')
+        self.child_values = array('i')
 
     def update(self, loser):
-        self.visits += 1
+        self._visits += 1
         # 1 point earned if the loser = node.player, node.player is used for getLegalMove
         # so, you can think in the way that 1 point eared if loser != node.parent.player
         if loser == self.player:
-            self.value += 1
+            self._value += 1
+        for parent, index in self.slots:
+            parent.child_visits[index] = self._visits
+            parent.child_values[index] = self._value
 
     def ucb1(self):
         if self.visits == 0 or self.parent is None or self.parent.visits == 0:
@@ -137,21 +383,90 @@ class Node:
 
 
 class MonteCarloPlayer(Player):
-    def __init__(self, symbol: str, number_of_simulations: int, c: float, simulation_type: str, sdepth: int, make_graph:bool):
-        super(MonteCarloPlayer, self).__init__(symbol)
+    def __init__(self, symbol: str, number_of_simulations: int, c: float, simulation_type: str, sdepth: int, make_graph:bool, engine: str = "list", ordering: bool = False, evaluator: str = "mobility", reuse_tree: bool = False, tree_store: str = "node", parallel: Optional[str] = None, workers: int = 1, rollouts_per_leaf: int = 1, max_time: Optional[float] = None, max_nodes: Optional[int] = None, transpositions: bool = False, max_tree_size: Optional[int] = None, rollout_plies: Optional[int] = None, rollout_evaluator: str = "mobility_diff", rollout_scale: float = 0.5, rollout_cache: int = 0, rollout_cache_scope: str = "search", graph_dir: str = "process"):
+        super(MonteCarloPlayer, self).__init__(symbol, evaluator)
+        if engine not in ("list", "bitboard"):
+            raise ValueError(f"Invalid engine: {engine}")
+        if tree_store not in ("node", "array"):
+            raise ValueError(f"Invalid tree store: {tree_store}")
+        if tree_store == "array" and (make_graph or reuse_tree):
+            raise ValueError("make_graph and reuse_tree need tree_store='node'")
+        if parallel not in (None, "root", "tree"):
+            raise ValueError(f"Invalid parallel mode: {parallel}")
+        if parallel is not None and make_graph:
+            raise ValueError("make_graph needs a serial search")
+        if parallel == "root" and reuse_tree:
+            raise ValueError("reuse_tree does not work with parallel='root'")
+        if parallel == "tree" and tree_store != "node":
+            raise ValueError("parallel='tree' needs tree_store='node'")
+        if transpositions and (tree_store != "node" or make_graph or reuse_tree or parallel == "tree"):
+            raise ValueError("transpositions need tree_store='node' without make_graph, reuse_tree or parallel='tree'")
+        if max_tree_size is not None and (tree_store != "node" or make_graph):
+            raise ValueError("max_tree_size needs tree_store='node' without make_graph")
+        if rollout_cache_scope not in ("search", "game"):
+            raise ValueError(f"Invalid rollout cache scope: {rollout_cache_scope}")
+        if rollout_plies is not None and rollout_plies < 0:
+            raise ValueError(f"Invalid rollout plies: {rollout_plies}")
+        if rollouts_per_leaf < 1:
+            raise ValueError(f"Invalid rollouts per leaf: {rollouts_per_leaf}")
         self.number_of_simulations = number_of_simulations
         self.c = c
         self.simulation_type = simulation_type
         self.simulation_count = 0
         self.sdepth = sdepth
         self.make_graph = make_graph
+        self.engine = engine
+        # with reuse_tree, the child we moved to is kept to search the next move from
+        self.reuse_tree = reuse_tree
+        self.root = None
+        # "node" keeps a Node object per position, "array" uses mcts_tree.ArrayTree
+        self.tree_store = tree_store
+        self.tree_stats = {}
+        # "root": every worker grows its own tree and the root statistics are merged,
+        # "tree": one tree here, with the simulations of each batch run by the workers
+        self.parallel = parallel
+        self.workers = workers
+        # simulations run from each leaf, random ones are played together by batch_rollout
+        self.rollouts_per_leaf = rollouts_per_leaf
+        # with a time (seconds) or node budget, getMove simulates until it is spent
+        # instead of running number_of_simulations, and plays the most visited child
+        self.max_time = max_time
+        self.max_nodes = max_nodes
+        # nodes added to the tree so far, and timings of the last search
+        self.tree_nodes = 0
+        self.search_start = 0.0
+        self.search_nodes = 0
+        self.search_simulations = 0
+        self.search_stats = {}
+        # simulations in a row that added no node, and the node count they left, see searching
+        self.idle_simulations = 0
+        self.idle_nodes = 0
+        # with transpositions the tree is a DAG: a position reached by different move
+        # orders is one node, found by zobrist key in self.table (reset every move)
+        self.transpositions = transpositions
+        self.table = {}
+        self.transposition_hits = 0
+        # cap on the nodes held in the tree, see prune_tree
+        self.max_tree_size = max_tree_size
+        self.live_nodes = 0
+        self.pruned = 0
+        # simulations stopped after rollout_plies moves are scored by rollout_evaluator for the
+        # side to move, and that side wins with probability sigmoid(rollout_scale * score)
+        self.rollout_plies = rollout_plies
+        self.rollout_evaluator_name = rollout_evaluator
+        self.rollout_evaluator = evaluation.getEvaluator(rollout_evaluator)
+        self.rollout_scale = rollout_scale
+        # LRU memo of alphabeta_getmove: (position key, depth) -> [move, value], emptied
+        # at the start of every move with scope "search", kept for the game with "game"
+        self.rollout_cache = transposition.LRUCache(rollout_cache) if rollout_cache > 0 else None
+        self.rollout_cache_scope = rollout_cache_scope
+        # move ordering for the alpha-beta searches of alphabeta simulations
+        self.orderer = move_ordering.MoveOrderer() if ordering else None
         self.index = 0
-        self.tree = None
         self.edges = []
-        self.actions = []
-        self.labels = {}
-        self.fig = None
-        self.ax = None
+        # with make_graph, the actions of each move are streamed to a log in graph_dir
+        self.graph_dir = graph_dir
+        self.recorder = None
 
     def selectInitialX(self, board: list) -> tuple:
         return (0, 0)
@@ -172,79 +487,45 @@ class MonteCarloPlayer(Player):
         a = a[:-1]
         return a
 
+    def graph_stats(self, node):
+        # the changing part of a node's labels
+        return [node.value, node.visits, round(node.ucb1(), 2), node.player]
+
     def add_graph_node(self, node):
-        # add labels for new node and append actions
-        self.labels[node] = [self.board_to_graph_string(node.state), "Val: " + str(node.value), "Visits: " + str(node.visits), "Ucb: " + str(round(node.ucb1(), 2)), "Player: " + str(node.player)]
-        self.actions.append(("add_node", node))
+        # record a new node with its labels
+        self.recorder.addNode(node, self.board_to_graph_string(node.state), self.graph_stats(node))
 
     def add_graph_nodes_with_edges(self, node):
         # add edges for each child for the parent node
         for child in node.children:
             self.add_graph_node(child)
-            self.actions.append(("add_edge", (node, child)))
+            self.recorder.addEdge(node, child)
 
     def update_graph_nodes(self, node):
-        # update node in labels
-        self.actions.append(("update", (node, [self.board_to_graph_string(node.state), "Val: " + str(node.value), "Visits: " + str(node.visits), "Ucb: " + str(round(node.ucb1(), 2)), "Player: " + str(node.player)])))
+        # record the node's labels, if they changed
+        self.recorder.update(node, self.graph_stats(node))
 
     def delete_graph_node(self, node):
-        self.actions.append(("del", node))
-
-
-    def update(self, move):
-        action, item = self.actions[move]
-        self.ax.clear()
-
-        if action == "add_node":
-            self.tree.add_node(item)
-        elif action == "add_edge":
-            self.tree.add_edge(*item)
-        elif action == "del":
-            self.tree.remove_node(item)
-        elif action == "update":
-            node, new_labels = item
-            self.labels[node] = new_labels
-
-
-        pos = nx.drawing.nx_agraph.graphviz_layout(self.tree, prog='dot')
-        nx.draw(self.tree, pos, with_labels=False, node_color='lightblue', node_size=2000, arrowsize=20, ax=self.ax)
-
-
-        for node, (x, y) in pos.items():
-            if node in self.labels:
-                for i, label in enumerate(self.labels[node]):
-                    # when i==0, the board size is very big, so adjust offset
-                    if i > 1:
-                        offset = 30 + i * 20
-                    else:
-                        offset = -40 + i * 90
-
-                    self.ax.annotate(label, xy=(x, y), xytext=(5, offset), textcoords='offset points', fontweight='bold',
-                                fontsize=10)
-
-    def draw_graph(self):
-        print("Starting draw graph")
-        self.tree = nx.DiGraph()
-        file_name = "process/MCTS Process " + str(self.index) + ".gif"
-        self.fig, self.ax = plt.subplots(figsize=(50, 25))
-        plt.close()
-        ani = animation.FuncAnimation(self.fig, self.update, frames=len(self.actions), interval=1000, repeat=False)
-        ani.save(file_name, writer='pillow', fps=1)
-        print("end draw")
-        self.fig = None
-        self.ax = None
-
-    def forward_propagation_update_graph(self, root:Node):
-        queue = [root]
+        self.recorder.delete(node)
+
+
+    def finish_graph(self):
+        # the move's log is complete, render.py draws it into a .gif later; getMove calls this
+        self.recorder.close()
+        self.recorder = None
 
+    def add_graph_subtree(self, node):
+        # add edges for every expanded node below node, e.g. a subtree kept from the last move
+        queue = [node]
         while queue:
             cur_node = queue.pop(0)
-            for child in cur_node.children:
-                self.update_graph_nodes(child)
-                queue.append(child)
+            if cur_node.children:
+                self.add_graph_nodes_with_edges(cur_node)
+                queue.extend(cur_node.children)
 
     def getMove(self, board: list) -> tuple:
         """This function is to get the next move of the player.
+        The number of simulations and the time they took are left in self.search_stats.
 
         Args:
             board (list): The current state of the board.
@@ -252,38 +533,150 @@ class MonteCarloPlayer(Player):
         Returns:
             tuple: The next move of the player.
         """
+        self.start_search()
+        try:
+            if self.parallel == "root":
+                move = self.get_move_root_parallel(board)
+            elif self.tree_store == "array":
+                move = self.get_move_array(board)
+            else:
+                move = self.get_move_tree(board)
+        finally:
+            # the move's log is closed even when the search raised
+            if self.recorder is not None:
+                self.finish_graph()
+        self.finish_search()
+        return move
+
+    def budgeted(self) -> bool:
+        return self.max_time is not None or self.max_nodes is not None
+
+    def start_search(self):
+        self.search_start = time.perf_counter()
+        self.search_nodes = self.tree_nodes
+        self.search_simulations = self.simulation_count
+        self.pruned = 0
+        if self.rollout_cache is not None and self.rollout_cache_scope == "search":
+            self.rollout_cache.clear()
+
+    def searching(self, done: int, number_of_simulations: int) -> bool:
+        """Whether to run another simulation, after done of them in this loop.
+        Without a budget the loop runs number_of_simulations times, with one it runs
+        at least once and then until the time or the new nodes run out.
+        Near the end of the game the whole tree can be smaller than max_nodes, and
+        simulations stop adding nodes, so a node budget also ends after max_nodes
+        simulations in a row that added none, and after SIMULATIONS_PER_NODE *
+        max_nodes simulations in all when there is no max_time."""
+        if not self.budgeted():
+            return done < number_of_simulations
+        if done == 0:
+            self.idle_simulations = 0
+            self.idle_nodes = self.tree_nodes
+            return True
+        if self.max_time is not None and time.perf_counter() - self.search_start >= self.max_time:
+            return False
+        if self.max_nodes is None:
+            return True
+        if self.tree_nodes == self.idle_nodes:
+            self.idle_simulations += 1
+        else:
+            self.idle_simulations = 0
+            self.idle_nodes = self.tree_nodes
+        if self.idle_simulations >= self.max_nodes:
+            return False
+        if self.max_time is None and done >= SIMULATIONS_PER_NODE * self.max_nodes:
+            return False
+        return self.tree_nodes - self.search_nodes < self.max_nodes
+
+    def finish_search(self):
+        seconds = time.perf_counter() - self.search_start
+        simulations = self.simulation_count - self.search_simulations
+        self.search_stats = {"simulations": simulations,
+                             "nodes": self.tree_nodes - self.search_nodes,
+                             "pruned": self.pruned,
+                             "seconds": seconds,
+                             "simulations_per_second": simulations / seconds if seconds > 0 else 0.0}
+        if self.rollout_cache is not None:
+            self.search_stats["rollout_cache"] = self.rollout_cache.stats()
+
+    def best_child(self, node):
+        # the most visited child when searching on a budget (first on ties), select() otherwise
+        if self.budgeted():
+            return max(node.children, key=lambda child: child.visits)
+        return self.select(node)
+
+    def get_move_tree(self, board: list) -> tuple:
+        """getMove for tree_store="node".
 
+        Args:
+            board (list): The current state of the board.
+
+        Returns:
+            tuple: The next move of the player.
+        """
         # get root node and expand it first
-        root_node = Node(state=board.copy(), c=self.c, player=self.symbol)
+        root_node = self.find_root(board)
+        self.transposition_hits = 0
+        if self.max_tree_size is not None:
+            self.live_nodes = len(self.reachable(root_node))
 
         self.edges = []
-        self.actions = []
-        self.labels = {}
+        self.nodes = 0
+        self.cutoffs = 0
+        if self.orderer is not None:
+            self.orderer.newSearch()
 
-        # add root node in the graph
+        # start this move's log and add root node in the graph
         if self.make_graph:
-            self.add_graph_node(root_node)
             self.index += 1
+            self.recorder = graph_recorder.GraphRecorder(graph_recorder.logPath(self.graph_dir, self.index))
+            self.add_graph_node(root_node)
 
         root_moves = game_rules.getLegalMoves(board, self.symbol)
-        self.expand(root_node, root_moves)
+        if not root_node.children:
+            self.expand(root_node, root_moves)
 
         if len(root_moves) == 1:
             if self.make_graph:
-                self.add_graph_nodes_with_edges(root_node)
-                self.draw_graph()
+                self.add_graph_subtree(root_node)
+            self.keep_subtree(root_node.children[0])
             return root_moves[0]
 
-        # add edges in the graph for root node
+        # add edges in the graph for root node, and for the subtree it kept from the last move
         if self.make_graph:
-            self.add_graph_nodes_with_edges(root_node)
+            self.add_graph_subtree(root_node)
+
+        if self.parallel == "tree":
+            self.run_simulations_tree_parallel(root_node, self.number_of_simulations)
+        else:
+            self.run_simulations(root_node, self.number_of_simulations)
+
+        best_child = self.best_child(root_node)
+        self.keep_subtree(best_child)
+        if self.transpositions:
+            # a shared node keeps the move of the parent that made it, which may not be the root
+            self.tree_stats = {"nodes": len(self.table), "transposition_hits": self.transposition_hits}
+            return root_moves[root_node.children.index(best_child)]
+        return best_child.move
+
+    def run_simulations(self, root_node, number_of_simulations):
+        """Runs the select, expand, simulate and backpropagate steps from an expanded root.
 
-        for i in range(self.number_of_simulations):
+        Args:
+            root_node (Node): The root of the tree to grow.
+            number_of_simulations (int): How many simulations to run.
+        """
+        done = 0
+        while self.searching(done, number_of_simulations):
+            done += 1
             node = root_node
+            # the nodes we went through, as a node can have more than one parent with transpositions
+            path = [node]
 
             # keep finding the optimal child until we find a leaf
             while node.children:
                 node = self.select(node)
+                path.append(node)
 
             # if this leaf have already been visited, then we expand it and choose the first child
             # if this leaf is the end of the game, which means it has no child, then we just choose this node
@@ -293,33 +686,279 @@ class MonteCarloPlayer(Player):
                 if self.make_graph:
                     self.add_graph_nodes_with_edges(node)
 
-                node = node.children[0] if len(node.children) != 0 else node
+                if len(node.children) != 0:
+                    node = node.children[0]
+                    path.append(node)
 
-            simulation_state, simulation_loser = self.run_simulation(node)
+            simulation_state, simulation_losers = self.simulate_leaf(node.state, node.player)
 
             temp_node = None
             if self.make_graph:
                 # append a temp simulation node in the graph
-                temp_node = Node(simulation_state, self.c, player = simulation_loser)
+                temp_node = Node(simulation_state, self.c, player = simulation_losers[0])
                 self.add_graph_node(temp_node)
-                self.actions.append(("add_edge", (node, temp_node)))
+                self.recorder.addEdge(node, temp_node)
 
 
-            # backpropagation
-            while node is not None:
-                node.update(simulation_loser)
-                if self.make_graph:
-                    self.update_graph_nodes(node)
-                node = node.parent
+            self.backpropagate(path, simulation_losers)
 
             # delete the temp simulation node after update
             if self.make_graph:
                 self.delete_graph_node(temp_node)
-                self.forward_propagation_update_graph(root_node)
 
+            if self.max_tree_size is not None and self.live_nodes > self.max_tree_size:
+                self.prune_tree(root_node)
+
+    def backpropagate(self, path, simulation_losers):
+        """Updates the nodes on a simulation's path with its results.
+        With make_graph the labels that changed are recorded: those of the nodes
+        on the path, and of their children, whose ucb1 moved with their parent's
+        visits. No other node changed, so the rest of the tree is not looked at.
+
+        Args:
+            path (list): The nodes from the root to the simulated leaf.
+            simulation_losers (list): The loser symbol of each simulation.
+        """
+        for node in reversed(path):
+            for simulation_loser in simulation_losers:
+                node.update(simulation_loser)
+            if self.make_graph:
+                self.update_graph_nodes(node)
         if self.make_graph:
-            self.draw_graph()
-        return self.select(root_node).move
+            for node in path:
+                for child in node.children:
+                    self.update_graph_nodes(child)
+
+    def get_move_array(self, board: list) -> tuple:
+        """getMove for tree_store="array": the same search on an mcts_tree.ArrayTree.
+        Boards are rebuilt by playing the moves from the root on the way down.
+        The size of the tree is left in self.tree_stats.
+
+        Args:
+            board (list): The current state of the board.
+
+        Returns:
+            tuple: The next move of the player.
+        """
+        self.nodes = 0
+        self.cutoffs = 0
+        if self.orderer is not None:
+            self.orderer.newSearch()
+
+        tree = mcts_tree.ArrayTree(board, self.symbol)
+        root_moves = game_rules.getLegalMoves(board, self.symbol)
+        tree.expand(0, root_moves)
+        self.tree_nodes += len(root_moves)
+        if len(root_moves) == 1:
+            return root_moves[0]
+
+        self.run_simulations_array(tree, board, self.number_of_simulations)
+
+        self.tree_stats = {"nodes": len(tree), "bytes": tree.memoryUsage(), "bytes_per_node": tree.bytesPerNode()}
+        if self.budgeted():
+            first = tree.first_child[0]
+            children = range(first, first + tree.num_children[0])
+            return tree.move(max(children, key=lambda child: tree.visits[child]))
+        return tree.move(tree.select(0, self.c))
+
+    def run_simulations_array(self, tree, board, number_of_simulations):
+        """run_simulations for an mcts_tree.ArrayTree whose root holds board.
+
+        Args:
+            tree (ArrayTree): The tree to grow, with its root expanded.
+            board (list): The board at the root.
+            number_of_simulations (int): How many simulations to run.
+        """
+        done = 0
+        while self.searching(done, number_of_simulations):
+            done += 1
+            node = 0
+            state = [row[:] for row in board]
+
+            # keep finding the optimal child until we find a leaf
+            while tree.num_children[node]:
+                node = tree.select(node, self.c)
+                game_rules.applyMove(state, tree.move(node))
+
+            # expand a leaf we have already visited and choose its first child
+            if tree.visits[node] != 0:
+                moves = game_rules.getLegalMoves(state, tree.player(node))
+                tree.expand(node, moves)
+                self.tree_nodes += len(moves)
+                if moves:
+                    node = tree.first_child[node]
+                    game_rules.applyMove(state, moves[0])
+
+            simulation_state, simulation_losers = self.simulate_leaf(state, tree.player(node))
+            for simulation_loser in simulation_losers:
+                tree.backpropagate(node, simulation_loser)
+
+    def worker_config(self) -> dict:
+        # arguments to build a copy of this player in a worker process
+        return {"symbol": self.symbol, "number_of_simulations": self.number_of_simulations, "c": self.c,
+                "simulation_type": self.simulation_type, "sdepth": self.sdepth, "make_graph": False,
+                "engine": self.engine, "ordering": self.orderer is not None, "evaluator": self.evaluator_name,
+                "tree_store": self.tree_store, "rollouts_per_leaf": self.rollouts_per_leaf,
+                "max_time": self.max_time, "max_nodes": self.max_nodes, "transpositions": self.transpositions,
+                "max_tree_size": self.max_tree_size, "rollout_plies": self.rollout_plies,
+                "rollout_evaluator": self.rollout_evaluator_name, "rollout_scale": self.rollout_scale,
+                "rollout_cache": self.rollout_cache.size if self.rollout_cache is not None else 0,
+                "rollout_cache_scope": self.rollout_cache_scope}
+
+    def get_pool(self):
+        """Returns the pool of self.workers processes the parallel searches run in.
+        It is made on first use and kept from move to move until close().
+        """
+        if self.pool is None:
+            self.pool = multiprocessing.get_context().Pool(self.workers)
+        return self.pool
+
+    def root_statistics(self, board: list, number_of_simulations: int) -> list:
+        """Searches board from scratch and returns [visits, value] of each root child,
+        in the order of game_rules.getLegalMoves. With a budget, the search runs until
+        it is spent instead.
+
+        Args:
+            board (list): The board to search.
+            number_of_simulations (int): How many simulations to run.
+
+        Returns:
+            list: [visits, value] of each root child.
+        """
+        self.start_search()
+        root_moves = game_rules.getLegalMoves(board, self.symbol)
+        if self.tree_store == "array":
+            tree = mcts_tree.ArrayTree(board, self.symbol)
+            tree.expand(0, root_moves)
+            self.run_simulations_array(tree, board, number_of_simulations)
+            first = tree.first_child[0]
+            return [[tree.visits[child], tree.values[child]] for child in range(first, first + len(root_moves))]
+        root_node = self.new_root(board)
+        self.live_nodes = 1
+        self.expand(root_node, root_moves)
+        self.run_simulations(root_node, number_of_simulations)
+        return [[child.visits, child.value] for child in root_node.children]
+
+    def get_move_root_parallel(self, board: list) -> tuple:
+        """getMove for parallel="root". The simulations are split between self.workers
+        processes, each growing its own tree from the same root. Their root children's
+        visits and values are added up and the move is chosen from the merged root with
+        select(), as the serial search does.
+
+        Args:
+            board (list): The current state of the board.
+
+        Returns:
+            tuple: The next move of the player.
+        """
+        root_moves = game_rules.getLegalMoves(board, self.symbol)
+        if len(root_moves) == 1:
+            return root_moves[0]
+
+        share, extra = divmod(self.number_of_simulations, self.workers)
+        counts = [share + 1 if i < extra else share for i in range(self.workers)]
+        config = self.worker_config()
+        if self.budgeted():
+            # every worker searches for the rest of the time, with its share of the nodes
+            counts = [1] * self.workers
+            if self.max_time is not None:
+                config["max_time"] = max(0.0, self.max_time - (time.perf_counter() - self.search_start))
+            if self.max_nodes is not None:
+                config["max_nodes"] = max(1, self.max_nodes // self.workers)
+        # seeds come from our own random state, so random.seed still makes a run repeatable
+        jobs = [(config, board, count, random.getrandbits(32)) for count in counts if count > 0]
+        results = self.get_pool().map(_rootParallelSearch, jobs)
+
+        root_node = Node(state=board.copy(), c=self.c, player=self.symbol)
+        self.expand(root_node, root_moves)
+        for statistics, simulations, nodes in results:
+            self.simulation_count += simulations
+            self.tree_nodes += nodes
+            for child, (visits, value) in zip(root_node.children, statistics):
+                child.visits += visits
+                child.value += value
+                root_node.visits += visits
+        return self.best_child(root_node).move
+
+    def run_simulations_tree_parallel(self, root_node, number_of_simulations):
+        """run_simulations for parallel="tree". Each batch selects self.workers leaves,
+        adding a virtual loss (a visit without a win) to every node on the way so the
+        next selection of the batch is steered elsewhere, then runs the batch's
+        simulations in a process pool and backpropagates the real results.
+
+        Args:
+            root_node (Node): The root of the tree to grow.
+            number_of_simulations (int): How many simulations to run.
+        """
+        config = self.worker_config()
+        pool = self.get_pool()
+        done = 0
+        while self.searching(done, number_of_simulations):
+            batch = self.workers if self.budgeted() else min(self.workers, number_of_simulations - done)
+            # virtual visits added to each node during this batch
+            virtual = {}
+            leaves = []
+            for i in range(batch):
+                node = root_node
+                while node.children:
+                    node = self.select(node)
+                # only real visits decide whether a leaf is expanded
+                if node.visits - virtual.get(node, 0) != 0:
+                    self.expand(node, game_rules.getLegalMoves(node.state, node.player))
+                    node = node.children[0] if len(node.children) != 0 else node
+                leaves.append(node)
+                while node is not None:
+                    node.visits += 1
+                    virtual[node] = virtual.get(node, 0) + 1
+                    node = node.parent
+
+            jobs = [(config, leaf.state, leaf.player, random.getrandbits(32)) for leaf in leaves]
+            results = pool.map(_parallelSimulation, jobs)
+
+            for node, count in virtual.items():
+                node.visits -= count
+            for node, (simulation_state, simulation_losers) in zip(leaves, results):
+                self.simulation_count += len(simulation_losers)
+                while node is not None:
+                    for simulation_loser in simulation_losers:
+                        node.update(simulation_loser)
+                    node = node.parent
+            done += batch
+
+            if self.max_tree_size is not None and self.live_nodes > self.max_tree_size:
+                self.prune_tree(root_node)
+
+    def find_root(self, board):
+        """Returns the node to search from. With reuse_tree, this is the grandchild
+        of our last root matching the opponent's reply, with all its statistics,
+        if the tree got that far; otherwise it is a new node.
+
+        Args:
+            board (list): The current state of the board.
+
+        Returns:
+            Node: The root for this move, detached from its old parent.
+        """
+        if self.root is not None:
+            for child in self.root.children:
+                if child.state == board:
+                    child.detach()
+                    return child
+        return self.new_root(board)
+
+    def new_root(self, board):
+        # a fresh root node, which starts a new transposition table when they are used
+        root = Node(state=board.copy(), c=self.c, player=self.symbol)
+        if self.transpositions:
+            root.key = zobrist.hashBoard(board, self.symbol)
+            self.table = {root.key: root}
+        return root
+
+    def keep_subtree(self, node):
+        # remember the child we are moving to, dropping its siblings
+        if self.reuse_tree:
+            node.detach()
+            self.root = node
 
     def select(self, node):
         """This function is to get the optimal child of the node
@@ -330,14 +969,28 @@ class MonteCarloPlayer(Player):
         Returns:
             node: The best child
         """
+        # same score as child.ucb1(), from the node's child_visits and child_values
+        parent_visits = node._visits
+        visits, values = node.child_visits, node.child_values
+        num_children = len(visits)
+        if num_children >= mcts_tree.VECTOR_MIN_CHILDREN:
+            # all the scores in one numpy operation on zero-copy views; argmax picks the first best like the loop
+            child_visits = np.frombuffer(visits, dtype=np.intc)
+            child_values = np.frombuffer(values, dtype=np.intc)
+            return node.children[int(np.argmax(mcts_tree.ucbScores(child_values, child_visits, parent_visits, self.c)))]
         best_score = NEG_INF
-        best_child = None
-        for child in node.children:
-            score = child.ucb1()
+        best_index = -1
+        log_visits = math.log(parent_visits) if parent_visits > 0 else 0.0
+        c = self.c
+        for i in range(num_children):
+            if visits[i] == 0 or parent_visits == 0:
+                score = POS_INF
+            else:
+                score = values[i] / visits[i] + c * math.sqrt(log_visits / visits[i])
             if score > best_score:
                 best_score = score
-                best_child = child
-        return best_child
+                best_index = i
+        return node.children[best_index] if best_index >= 0 else None
 
     def expand(self, node, legal_moves):
         """This function is to expand current node, get its children
@@ -347,11 +1000,78 @@ class MonteCarloPlayer(Player):
             legal_moves(list): returns from game_rule.getLeagalmove
 
         """
+        if node.key is not None:
+            self.expand_shared(node, legal_moves)
+            return
+        self.tree_nodes += len(legal_moves)
+        self.live_nodes += len(legal_moves)
         for move in legal_moves:
             new_board = game_rules.makeMove(node.state.copy(), move)
             expansion_node = Node(new_board, self.c, player='o' if node.player == 'x' else 'x', parent=node, move=move)
             node.add_child(expansion_node)
 
+    def expand_shared(self, node, legal_moves):
+        """expand() with transpositions: a child whose position is already in
+        self.table is linked to instead of being created again, keeping its statistics.
+
+        Args:
+            node: current node, with its key set.
+            legal_moves(list): returns from game_rule.getLeagalmove
+        """
+        player = 'o' if node.player == 'x' else 'x'
+        for move in legal_moves:
+            new_board = [row[:] for row in node.state]
+            key, undo = zobrist.applyMove(new_board, move, node.key)
+            child = self.table.get(key)
+            if child is None:
+                child = Node(new_board, self.c, player=player, parent=node, move=move)
+                child.key = key
+                self.table[key] = child
+                self.tree_nodes += 1
+                self.live_nodes += 1
+            else:
+                self.transposition_hits += 1
+            node.add_child(child)
+
+    def reachable(self, root) -> list:
+        # every node under root (root included), once each even when shared
+        seen = {id(root)}
+        nodes = [root]
+        for node in nodes:
+            for child in node.children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    nodes.append(child)
+        return nodes
+
+    def prune_tree(self, root):
+        """Brings the tree back down to PRUNE_TO of self.max_tree_size nodes by
+        collapsing the least visited nodes whose children are all leaves into leaves.
+        A collapsed node keeps its own visits and value, and is expanded again the
+        next time a simulation reaches it.
+
+        Args:
+            root (Node): The root of the search, which is never collapsed.
+        """
+        target = int(self.max_tree_size * PRUNE_TO)
+        while self.live_nodes > target:
+            nodes = self.reachable(root)
+            frontier = [node for node in nodes if node is not root and node.children and not any(child.children for child in node.children)]
+            if not frontier:
+                break
+            frontier.sort(key=lambda node: node.visits)
+            for node in frontier:
+                if self.live_nodes <= target:
+                    break
+                self.live_nodes -= len(node.children)
+                self.pruned += len(node.children)
+                node.clear_children()
+            if self.transpositions:
+                # shared children may still hang off another parent, so count again
+                nodes = self.reachable(root)
+                self.table = {node.key: node for node in nodes}
+                self.live_nodes = len(nodes)
+
     def run_simulation(self, node: Node) -> list:
         """ Runs a simulation from the given node and returns the result.
 
@@ -366,6 +1086,31 @@ class MonteCarloPlayer(Player):
         player = node.player
         return self.simulate(state, player)
 
+    def simulate_leaf(self, board: list, symbol: str) -> list:
+        """ Runs self.rollouts_per_leaf simulations from one leaf. Random simulations
+        are played together on a stack of boards by batch_rollout.playouts.
+
+        Args:
+            board (list): The board to simulate on.
+            symbol (str): The symbol to simulate with.
+
+        Returns:
+            [list: final board of the first simulation, list: loser symbol of each simulation]
+        """
+        self.simulation_count += self.rollouts_per_leaf
+        if self.rollouts_per_leaf == 1:
+            state, loser = self.simulate(board, symbol)
+            return [state, [loser]]
+        if self.simulation_type == "random":
+            states, losers = batch_rollout.randomPlayouts(board, symbol, self.rollouts_per_leaf, max_plies=self.rollout_plies)
+            if None in losers:
+                player = symbol if self.rollout_plies % 2 == 0 else ('o' if symbol == 'x' else 'x')
+                losers = [loser if loser is not None else self.cutoff_loser(batch_rollout.toList(state), player)
+                          for state, loser in zip(states, losers)]
+            return [batch_rollout.toList(states[0]), losers]
+        results = [self.simulate(board, symbol) for i in range(self.rollouts_per_leaf)]
+        return [results[0][0], [loser for state, loser in results]]
+
     def simulate(self, board: list, symbol: str) -> list:
         """ Calls the appropriate simulation function based on the simulation type.
 
@@ -396,12 +1141,25 @@ class MonteCarloPlayer(Player):
         Returns:
             [list: final board, char: loser symbol]
         """
+        if self.engine == "bitboard":
+            state, loser = bitboard.randomPlayout(bitboard.fromList(board), symbol, max_plies=self.rollout_plies)
+            state = bitboard.toList(state)
+            if loser is None:
+                # stopped after rollout_plies, with the same side to move as at the start if they were even
+                player = symbol if self.rollout_plies % 2 == 0 else ('o' if symbol == 'x' else 'x')
+                return [state, self.cutoff_loser(state, player)]
+            return [state, loser]
+
         state = board
         player = symbol
         moves = game_rules.getLegalMoves(state, player)
+        plies = 0
 
         # Keep playing random moves until there are no legal moves left
         while moves:
+            if plies == self.rollout_plies:
+                return [state, self.cutoff_loser(state, player)]
+            plies += 1
             move = random.choice(moves)
             state = game_rules.makeMove(state, move)
             player = 'o' if player == 'x' else 'x'
@@ -424,7 +1182,11 @@ class MonteCarloPlayer(Player):
         player = symbol
         depth = self.sdepth
         moves = game_rules.getLegalMoves(state, player)
+        plies = 0
         while moves:
+            if plies == self.rollout_plies:
+                return [state, self.cutoff_loser(state, player)]
+            plies += 1
             move = self.alphabeta_getmove(state, player, depth)
             state = game_rules.makeMove(state, move)
             new_player = 'o' if player == 'x' else 'x'
@@ -434,6 +1196,29 @@ class MonteCarloPlayer(Player):
         # if we lose, value = -1, otherwise 1
         return [state, player]
 
+    def cutoff_loser(self, board: list, player: str) -> str:
+        """Decides the loser of a simulation stopped after self.rollout_plies moves.
+        The board is scored for the side to move with self.rollout_evaluator, the score
+        is mapped to that side's chance of winning by a logistic curve, and the loser is
+        drawn with that chance, so a close position is worth about half a win.
+
+        Args:
+            board (list): The board the simulation stopped on.
+            player (str): The side to move on it.
+
+        Returns:
+            char: loser symbol
+        """
+        score = self.rollout_evaluator(board, player)
+        x = self.rollout_scale * score
+        # exp is only taken of a value <= 0, so a large scale or score cannot overflow
+        if x >= 0:
+            win_probability = 1 / (1 + math.exp(-x))
+        else:
+            win_probability = math.exp(x) / (1 + math.exp(x))
+        other = 'o' if player == 'x' else 'x'
+        return other if random.random() < win_probability else player
+
     def alphabeta_getmove(self, board, player, depth) -> tuple:
         if depth == 0:
             legalMoves = game_rules.getLegalMoves(board, player)
@@ -442,25 +1227,38 @@ class MonteCarloPlayer(Player):
             else:
                 return None
 
-        return self.alpha_beta_max_value(board, NEG_INF, POS_INF, 0, player, depth)[0]
+        if self.rollout_cache is None:
+            return self.alpha_beta_max_value(board, NEG_INF, POS_INF, 0, player, depth)[0]
+        # the search is over the full window, so its result only depends on the position and depth
+        key = (zobrist.hashBoard(board, player), depth)
+        entry = self.rollout_cache.get(key)
+        if entry is None:
+            entry = self.alpha_beta_max_value(board, NEG_INF, POS_INF, 0, player, depth)
+            self.rollout_cache.put(key, entry)
+        return entry[0]
 
     def alpha_beta_max_value(self, board, alpha, beta, d, player, depth):
         if d == depth:
             return None
 
+        self.nodes += 1
         legalMoves = game_rules.getLegalMoves(board, player)
         if len(legalMoves) > 0:
+            if self.orderer is not None:
+                legalMoves = self.orderer.order(legalMoves, d)
             max_v = NEG_INF
             ans = None
             for move in legalMoves:
-                new_board = game_rules.makeMove(board, move)
-                tmp = self.alpha_beta_min_value(new_board, alpha, beta, d+1, player, depth)
-                v = tmp if tmp is not None else self.h1(new_board, player)
+                undo = game_rules.applyMove(board, move)
+                tmp = self.alpha_beta_min_value(board, alpha, beta, d+1, player, depth)
+                v = tmp if tmp is not None else self.evaluate(board)
+                game_rules.undoMove(board, undo)
                 if v > max_v:
                     max_v = v
                     ans = move
                 alpha = max(max_v, alpha)
                 if beta <= alpha:
+                    self.recordCutoff(move, d, depth - d)
                     return ans if d == 0 else max_v
             return [ans, max_v] if d == 0 else max_v
         else:
@@ -470,22 +1268,52 @@ class MonteCarloPlayer(Player):
         if d == depth:
             return None
 
+        self.nodes += 1
         legalMoves = game_rules.getLegalMoves(board, 'o' if player == 'x' else 'x')
         if len(legalMoves) > 0:
+            if self.orderer is not None:
+                legalMoves = self.orderer.order(legalMoves, d)
             min_v = POS_INF
             for move in legalMoves:
-                new_board = game_rules.makeMove(board, move)
-                tmp = self.alpha_beta_max_value(new_board, alpha, beta, d+1, player, depth)
-                v = tmp if tmp is not None else self.h1(new_board, player)
+                undo = game_rules.applyMove(board, move)
+                tmp = self.alpha_beta_max_value(board, alpha, beta, d+1, player, depth)
+                v = tmp if tmp is not None else self.evaluate(board)
+                game_rules.undoMove(board, undo)
                 min_v = min(min_v, v)
                 beta = min(min_v, beta)
                 if beta <= alpha:
+                    self.recordCutoff(move, d, depth - d)
                     return min_v
             return min_v
         else:
             return None
 
 
+# player built from MonteCarloPlayer.worker_config, cached in each worker process
+_workerPlayer = None
+
+def _getWorkerPlayer(config):
+    global _workerPlayer
+    if _workerPlayer is None or _workerPlayer.worker_config() != config:
+        _workerPlayer = MonteCarloPlayer(**config)
+    return _workerPlayer
+
+def _rootParallelSearch(job):
+    # One worker of MonteCarloPlayer.get_move_root_parallel
+    config, board, number_of_simulations, seed = job
+    random.seed(seed)
+    player = _getWorkerPlayer(config)
+    statistics = player.root_statistics(board, number_of_simulations)
+    player.finish_search()
+    return statistics, player.search_stats["simulations"], player.search_stats["nodes"]
+
+def _parallelSimulation(job):
+    # One simulation of MonteCarloPlayer.run_simulations_tree_parallel
+    config, board, symbol, seed = job
+    random.seed(seed)
+    return _getWorkerPlayer(config).simulate_leaf(board, symbol)
+
+
 class RandomPlayer(Player):
     def __init__(self, symbol):
         super(RandomPlayer, self).__init__(symbol)
@@ -529,13 +1357,13 @@ class NotImplementedException:
     def __init__(self, message): self.message = message
     def __str__(self): return self.message
 
-def makePlayer(playerType, symbol, depth, numSimulate, cValue, sType, sdepth, make_graph):
+def makePlayer(playerType, symbol, depth, numSimulate, cValue, sType, sdepth, make_graph, engine="list", ttSize=0, maxTime=None, ordering=False, evaluator="mobility", workers=1, reuseTree=False, treeStore="node", parallel=None, rolloutsPerLeaf=1, maxNodes=None, transpositions=False, maxTreeSize=None, rolloutPlies=None, rolloutEvaluator="mobility_diff", rolloutScale=0.5, rolloutCache=0, rolloutCacheScope="search"):
     player = playerType[0].lower()
     if player   == 'h': return HumanPlayer(symbol)
     elif player == 'r': return RandomPlayer(symbol)
-    elif player == 'a': return AlphaBetaPlayer(symbol, depth)
+    elif player == 'a': return AlphaBetaPlayer(symbol, depth, ttSize, maxTime, ordering, evaluator, workers)
     elif player == 'd': return DeterministicPlayer(symbol)
-    elif player == 'c': return MonteCarloPlayer(symbol, numSimulate, cValue, sType, sdepth, make_graph)
+    elif player == 'c': return MonteCarloPlayer(symbol, numSimulate, cValue, sType, sdepth, make_graph, engine, ordering, evaluator, reuseTree, treeStore, parallel, workers, rolloutsPerLeaf, maxTime, maxNodes, transpositions, maxTreeSize, rolloutPlies, rolloutEvaluator, rolloutScale, rolloutCache, rolloutCacheScope)
     else: raise NotImplementedException('Unrecognized player type {}'.format(playerType))
 
 def callMoveFunction(player, board):
@@ -0,0 +1,129 @@
+import argparse
+import glob
+import os
+import multiprocessing
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.animation as animation
+import networkx as nx
+import graph_recorder
+
+###########################################################################
+# Offline renderer for the MCTS process logs written with make_graph.
+# The search only writes "MCTS Process <n>.jsonl" logs (see graph_recorder.py),
+# and this turns them into the matching .gif files afterwards:
+#     python render.py process --workers 4
+# Each move is drawn by its own worker process. Laying the tree out with
+# graphviz is the slow part of a frame, so node positions are kept between
+# frames and only worked out again when a node or an edge is added or removed;
+# frames that only change labels reuse them.
+###########################################################################
+
+# inches, big enough for the board labels of an 8x8 game
+FIGSIZE = (50, 25)
+
+
+def dotLayout(tree):
+    return nx.drawing.nx_agraph.graphviz_layout(tree, prog='dot')
+
+
+def gifPath(path):
+    return os.path.splitext(path)[0] + ".gif"
+
+
+class Renderer(object):
+    """ Draws the frames of one log. """
+    def __init__(self, path, layout=dotLayout, figsize=FIGSIZE):
+        self.replay = graph_recorder.GraphReplay(path)
+        self.layout = layout
+        self.pos = None
+        self.shape = None
+        self.layouts = 0
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        plt.close()
+
+    def draw(self, frame):
+        self.replay.seek(frame)
+        if self.shape != self.replay.shape:
+            self.pos = self.layout(self.replay.tree)
+            self.shape = self.replay.shape
+            self.layouts += 1
+
+        self.ax.clear()
+        nx.draw(self.replay.tree, self.pos, with_labels=False, node_color='lightblue', node_size=2000, arrowsize=20, ax=self.ax)
+
+        for node, (x, y) in self.pos.items():
+            if node in self.replay.labels:
+                for i, label in enumerate(self.replay.labels[node]):
+                    # when i==0, the board size is very big, so adjust offset
+                    if i > 1:
+                        offset = 30 + i * 20
+                    else:
+                        offset = -40 + i * 90
+
+                    self.ax.annotate(label, xy=(x, y), xytext=(5, offset), textcoords='offset points', fontweight='bold',
+                                fontsize=10)
+
+
+def renderLog(path, gif_path=None, layout=dotLayout, figsize=FIGSIZE) -> dict:
+    """Draws one move's log into a .gif, one frame per event.
+
+    Args:
+        path (str): The .jsonl log written by graph_recorder.GraphRecorder.
+        gif_path (str, optional): Where to save the .gif. Defaults to the log's path with a .gif extension.
+        layout (function, optional): Returns node positions for a networkx tree. Defaults to graphviz dot.
+        figsize (tuple, optional): Size of the frames in inches.
+
+    Returns:
+        dict: the log, the .gif, and how many frames and layouts were drawn.
+    """
+    gif_path = gif_path or gifPath(path)
+    with open(path) as file:
+        frames = sum(1 for line in file)
+    renderer = Renderer(path, layout, figsize)
+    ani = animation.FuncAnimation(renderer.fig, renderer.draw, frames=frames, interval=1000, repeat=False)
+    ani.save(gif_path, writer='pillow', fps=1)
+    return {"log": path, "gif": gif_path, "frames": frames, "layouts": renderer.layouts}
+
+
+def _renderJob(job):
+    path, layout, figsize = job
+    return renderLog(path, layout=layout, figsize=figsize)
+
+
+def renderAll(directory="process", workers=None, layout=dotLayout, figsize=FIGSIZE, only_missing=False):
+    """Draws every log in a directory, one move per worker process.
+
+    Args:
+        directory (str): Where the logs are.
+        workers (int, optional): Number of processes. Defaults to one per CPU.
+        layout (function, optional): Passed to renderLog.
+        figsize (tuple, optional): Passed to renderLog.
+        only_missing (bool, optional): Skip logs that already have a .gif.
+
+    Yields:
+        dict: the result of renderLog for each log, as each one finishes.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.jsonl")))
+    if only_missing:
+        paths = [path for path in paths if not os.path.exists(gifPath(path))]
+    if not paths:
+        return
+    with multiprocessing.get_context().Pool(min(workers or os.cpu_count(), len(paths))) as pool:
+        for result in pool.imap_unordered(_renderJob, [(path, layout, figsize) for path in paths]):
+            yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw the MCTS process logs written with make_graph into .gif files.")
+    parser.add_argument("directory", nargs="?", default="process", help="folder holding the .jsonl logs")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, one per CPU by default")
+    parser.add_argument("--only-missing", action="store_true", help="skip logs that already have a .gif")
+    args = parser.parse_args()
+    for result in renderAll(args.directory, args.workers, only_missing=args.only_missing):
+        print(result["gif"] + ": " + str(result["frames"]) + " frames, " + str(result["layouts"]) + " layouts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import json
+import sqlite3
+import time
+import sweep
+
+###########################################################################
+# SQLite store of played games, so thousands of runs can be compared with a
+# query instead of reading JSON back in:
+#   runs        one row per tournament, sweep or imported history.json entry
+#   parameters  the makePlayer arguments of each run's x and o players
+#   games       one row per game: winner, number of moves, seconds, and the
+#               seconds of every move as a JSON list
+# A sweep's players differ from game to game in one argument (runs.parameter
+# on runs.side), so that argument's value is kept on each game instead of in
+# parameters. Parameter values are stored as SQLite numbers or text, so 0 and
+# 0.0 are the same value; other values are stored as JSON text.
+# A sweep is one run however many times its games are added, found by its
+# settings (see sweep.sweepSettings), and a game is only added to a run once.
+#     with ResultsStore("results.db") as store:
+#         store.addTournament(config1, config2, results, size=8, seed=1)
+#         store.winRates("cValue", where={"o.playerType": "a"})
+###########################################################################
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    label TEXT,
+    created REAL NOT NULL,
+    size INTEGER,
+    seed INTEGER,
+    parameter TEXT,
+    side TEXT,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    side TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value,
+    PRIMARY KEY (run_id, side, name)
+);
+CREATE INDEX IF NOT EXISTS parameters_name ON parameters(name, side, value);
+CREATE TABLE IF NOT EXISTS games (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    game INTEGER NOT NULL,
+    value,
+    seed INTEGER,
+    winner TEXT NOT NULL,
+    moves INTEGER,
+    seconds REAL,
+    move_times TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS games_run ON games(run_id, value, game);
+"""
+
+# history.json keys and the makePlayer arguments they were
+HISTORY_PARAMETERS = {"simulations": "numSimulate", "ab depth": "depth", "simulation": "sType", "simulation depth": "sdepth"}
+
+
+def storedValue(value):
+    """Returns a parameter value as it is kept in the store."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return json.dumps(value)
+
+
+class ResultsStore(object):
+    """ A results database, created on first use. """
+    def __init__(self, path="results.db"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def __str__(self):
+        return "{ResultsStore " + self.path + ", Runs: " + str(len(self.runs())) + "}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _addGames(self, run, games):
+        # a game already in the run is skipped
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO games (run_id, game, value, seed, winner, moves, seconds, move_times) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run, game["game"], storedValue(game.get("value")), game.get("seed"), game["winner"], game.get("moves"),
+              game.get("seconds"), json.dumps(game["move_times"]) if "move_times" in game else None) for game in games])
+
+    def addRun(self, kind, config1, config2, games, size=None, seed=None, parameter=None, side=None, label=None, settings=None) -> int:
+        """Adds a run and all its games in one transaction.
+
+        Args:
+            kind (str): "tournament", "sweep" or "history".
+            config1 (dict): makePlayer arguments of x, without the symbol.
+            config2 (dict): makePlayer arguments of o, without the symbol.
+            games (list): Game results as from tournament.playGame, with the "value" of parameter for a sweep.
+            size (int, optional): Rows and columns of the board.
+            seed (int, optional): Seed the game seeds were drawn from.
+            parameter (str, optional): The makePlayer argument each game has its own "value" of.
+            side (str, optional): 'x' or 'o', the player parameter was set on.
+            label (str, optional): Free text to find the run by.
+            settings (str, optional): JSON of a sweep's settings, see addSweep.
+
+        Returns:
+            int: the id of the run.
+        """
+        with self.connection:
+            run = self.connection.execute(
+                "INSERT INTO runs (kind, label, created, size, seed, parameter, side, settings) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, label, time.time(), size, seed, parameter, side, settings)).lastrowid
+            self.connection.executemany(
+                "INSERT INTO parameters (run_id, side, name, value) VALUES (?, ?, ?, ?)",
+                [(run, player, name, storedValue(value))
+                 for player, config in (('x', config1), ('o', config2))
+                 for name, value in config.items() if not (name == parameter and player == side)])
+            self._addGames(run, games)
+        return run
+
+    def addTournament(self, config1, config2, games, size=8, seed=None, label=None) -> int:
+        """Adds the results of tournament.runTournament, see addRun."""
+        return self.addRun("tournament", config1, config2, games, size, seed, label=label)
+
+    def addSweep(self, settings, games, label=None) -> int:
+        """Adds the results of sweep.runSweep.
+
+        The games of a sweep already in the store go to its run, and the games
+        already in that run are skipped, so a resumed sweep can add all the games
+        of its checkpoint again.
+
+        Args:
+            settings (dict): The sweep's settings, see sweep.sweepSettings.
+            games (list): Its game results.
+            label (str, optional): Free text to find the run by, when the run is new.
+
+        Returns:
+            int: the id of the run.
+        """
+        key = json.dumps(settings, sort_keys=True)
+        row = self.connection.execute("SELECT id FROM runs WHERE kind = 'sweep' AND settings = ?", (key,)).fetchone()
+        if row is None:
+            return self.addRun("sweep", settings["config1"], settings["config2"], games, settings["size"], settings["seed"],
+                               settings["parameter"], settings["side"], label, key)
+        with self.connection:
+            self._addGames(row[0], games)
+        return row[0]
+
+    def importHistory(self, path="history.json") -> list:
+        """Adds the c_value sweeps recorded in history.json by the old test2, each once.
+
+        history.json only has the number of x wins of every c_value, so each game
+        is added with its winner alone, x's wins first, and no seed or timings.
+
+        Returns:
+            list: the ids of the runs added.
+        """
+        added = []
+        with open(path) as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+        for entry in entries:
+            label = "history " + str(entry["num"])
+            if self.connection.execute("SELECT 1 FROM runs WHERE kind = 'history' AND label = ?", (label,)).fetchone():
+                continue
+            players = [{"playerType": entry[key]} for key in ("player1", "player2")]
+            for key, name in HISTORY_PARAMETERS.items():
+                for config in players:
+                    config[name] = entry[key]
+            games = []
+            for c, wins in entry["result"].items():
+                games += [{"game": game, "value": float(c), "winner": 'X' if game < wins else 'O'} for game in range(entry["game"])]
+            added.append(self.addRun("history", players[0], players[1], games, entry["size"], parameter="cValue", side='x', label=label))
+        return added
+
+    def runs(self, kind=None) -> list:
+        """Every run, or those of one kind, with its number of games and x's wins."""
+        query = ("SELECT runs.id, kind, label, created, size, runs.seed, parameter, side, COUNT(games.run_id), TOTAL(games.winner = 'X') "
+                 "FROM runs LEFT JOIN games ON games.run_id = runs.id")
+        query += " WHERE kind = ?" if kind else ""
+        rows = self.connection.execute(query + " GROUP BY runs.id ORDER BY runs.id", (kind,) if kind else ())
+        keys = ("id", "kind", "label", "created", "size", "seed", "parameter", "side", "games", "x_wins")
+        return [dict(zip(keys, row[:-1] + (int(row[-1]),))) for row in rows]
+
+    def parameters(self, run) -> list:
+        """Returns the [x, o] makePlayer arguments of a run, without a sweep's parameter."""
+        players = {'x': {}, 'o': {}}
+        for side, name, value in self.connection.execute("SELECT side, name, value FROM parameters WHERE run_id = ?", (run,)):
+            players[side][name] = value
+        return [players['x'], players['o']]
+
+    def games(self, run) -> list:
+        """Returns the games of a run in game order, as from tournament.playGame."""
+        rows = self.connection.execute(
+            "SELECT game, value, seed, winner, moves, seconds, move_times FROM games WHERE run_id = ? ORDER BY game, rowid", (run,))
+        return [{"game": game, "value": value, "seed": seed, "winner": winner, "moves": moves, "seconds": seconds,
+                 "move_times": json.loads(move_times) if move_times is not None else None}
+                for game, value, seed, winner, moves, seconds, move_times in rows]
+
+    def winRates(self, name, side='x', where=None, size=None) -> list:
+        """x's win rate for every value of one makePlayer argument, over all the runs that set it.
+
+        Args:
+            name (str): The makePlayer argument, e.g. "cValue".
+            side (str, optional): The player it was set on, 'x' or 'o'. Defaults to 'x'.
+            where (dict, optional): Only the runs whose players had these arguments, e.g. {"o.playerType": "a"}.
+            size (int, optional): Only the games on this size of board.
+
+        Returns:
+            list: for each value in order, a dict of the value, games, x_wins, win_rate and its 95% Wilson interval (low, high).
+        """
+        query = ("SELECT CASE WHEN runs.parameter = ? AND runs.side = ? THEN games.value ELSE parameters.value END AS setting, "
+                 "COUNT(*), TOTAL(games.winner = 'X') "
+                 "FROM games JOIN runs ON runs.id = games.run_id "
+                 "LEFT JOIN parameters ON parameters.run_id = runs.id AND parameters.side = ? AND parameters.name = ? WHERE 1")
+        arguments = [name, side, side, name]
+        if size is not None:
+            query += " AND runs.size = ?"
+            arguments.append(size)
+        for key, value in (where or {}).items():
+            player, argument = key.split(".", 1)
+            query += " AND EXISTS (SELECT 1 FROM parameters AS fixed WHERE fixed.run_id = runs.id AND fixed.side = ? AND fixed.name = ? AND fixed.value = ?)"
+            arguments += [player, argument, storedValue(value)]
+        rates = []
+        for value, games, wins in self.connection.execute(query + " GROUP BY setting HAVING setting IS NOT NULL ORDER BY setting", arguments):
+            low, high = sweep.wilson(int(wins), games)
+            rates.append({"value": value, "games": games, "x_wins": int(wins), "win_rate": wins / games, "low": low, "high": high})
+        return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show x's win rate for every value of one makePlayer argument.")
+    parser.add_argument("name", help="the makePlayer argument, e.g. cValue")
+    parser.add_argument("--store", default="results.db")
+    parser.add_argument("--side", choices=["x", "o"], default="x", help="the player the argument is set on")
+    parser.add_argument("--where", nargs="*", default=[], help="only runs whose players had these arguments, e.g. o.playerType=a")
+    parser.add_argument("--size", type=int, default=None)
+    parser.add_argument("--import-history", metavar="PATH", default=None, help="add the runs of an old history.json first")
+    args = parser.parse_args()
+    where = {}
+    for condition in args.where:
+        key, value = condition.split("=", 1)
+        try:
+            where[key] = json.loads(value)
+        except ValueError:
+            where[key] = value
+    with ResultsStore(args.store) as store:
+        if args.import_history:
+            store.importHistory(args.import_history)
+        for rate in store.winRates(args.name, args.side, where, args.size):
+            print(json.dumps(rate))
+
+
+if __name__ == "__main__":
+    main()
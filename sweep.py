@@ -0,0 +1,264 @@
+import argparse
+import collections
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import results_store
+import tournament
+
+###########################################################################
+# Parameter sweeps, e.g. the win rate of MCTS against alpha-beta for every
+# c_value of a grid:
+#     python sweep.py '{"playerType": "c", ...}' '{"playerType": "a", ...}' \
+#                     cValue 0 0.05 0.1 --games 100 --checkpoint sweep.jsonl
+# Every (value, game) pair is one job for a process pool, so all the values
+# are played at once. Jobs are handed out game by game across the values
+# (game 0 of every value, then game 1, ...) so every value has about as many
+# games at any time.
+# Each finished game is appended to a JSON lines checkpoint right away. The
+# first line holds the sweep's players, parameter and seed; every other line
+# is one game. Running the same sweep again with the same checkpoint skips
+# the games already in it, so a crashed sweep carries on where it stopped,
+# and more values or games can be added to a finished one.
+# With ci_width, a value stops getting new games once the Wilson interval of
+# x's win rate is no wider than ci_width on each side. Games of it that are
+# already being played are still finished and recorded.
+###########################################################################
+
+# z of a 95% confidence interval
+Z95 = 1.96
+
+
+def wilson(wins: int, games: int, z=Z95) -> tuple:
+    """Returns the (low, high) Wilson score interval of a win rate, (0, 1) with no games."""
+    if games == 0:
+        return (0.0, 1.0)
+    p = wins / games
+    denominator = 1 + z * z / games
+    center = (p + z * z / (2 * games)) / denominator
+    half = z * math.sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / denominator
+    return (max(0.0, center - half), min(1.0, center + half))
+
+
+def readCheckpoint(path):
+    """Reads a checkpoint written by runSweep.
+
+    A line cut short by a crash is dropped from the file, so games can be
+    appended after the last complete one.
+
+    Returns:
+        [dict: the sweep settings, or None for a missing or empty file, list: the game results]
+    """
+    if not os.path.exists(path):
+        return [None, []]
+    header, results, good = None, [], 0
+    with open(path, "rb") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+            if header is None:
+                header = record["sweep"]
+            else:
+                results.append(record)
+    if good != os.path.getsize(path):
+        with open(path, "r+b") as file:
+            file.truncate(good)
+    return [header, results]
+
+
+def _sweepGame(job) -> dict:
+    value, game = job
+    return dict(tournament.playGame(game), value=value)
+
+
+def _schedule(nextJob, workers):
+    # Plays the jobs returned by nextJob() until it returns None, keeping at most
+    # workers games going, and yields their results as they finish. nextJob is only
+    # called for a free worker, so it sees every result yielded before it.
+    if workers <= 1:
+        job = nextJob()
+        while job is not None:
+            yield _sweepGame(job)
+            job = nextJob()
+        return
+    finished = queue.Queue()
+    with multiprocessing.get_context().Pool(workers) as pool:
+        running = 0
+        while True:
+            while running < workers:
+                job = nextJob()
+                if job is None:
+                    break
+                pool.apply_async(_sweepGame, (job,), callback=finished.put, error_callback=finished.put)
+                running += 1
+            if running == 0:
+                return
+            result = finished.get()
+            running -= 1
+            if isinstance(result, BaseException):
+                raise result
+            yield result
+
+
+def sweepSettings(config1: dict, config2: dict, parameter: str, size=8, seed=None, side='x', checkpoint=None) -> dict:
+    """Returns the settings a sweep is played with, as kept in the first line of its checkpoint.
+
+    With no seed, the seed of the checkpoint is used, or a new one is picked, so
+    the settings always hold the seed the games are drawn from.
+
+    Raises:
+        ValueError: the checkpoint is of a sweep with other settings.
+    """
+    header = readCheckpoint(checkpoint)[0] if checkpoint is not None else None
+    if seed is None:
+        seed = header["seed"] if header is not None else random.getrandbits(32)
+    settings = json.loads(json.dumps({"config1": config1, "config2": config2, "parameter": parameter, "side": side,
+                                      "size": size, "seed": seed}))
+    if header is not None and header != settings:
+        raise ValueError("checkpoint " + checkpoint + " is of another sweep: " + json.dumps(header))
+    return settings
+
+
+def runSweep(config1: dict, config2: dict, parameter: str, values: list, games: int, workers=None, size=8, seed=None,
+             checkpoint=None, ci_width=None, min_games=10, side='x'):
+    """Plays games between x (config1) and o (config2) for every value of one makePlayer argument.
+
+    Args:
+        config1 (dict): makePlayer arguments of x, without the symbol.
+        config2 (dict): makePlayer arguments of o, without the symbol.
+        parameter (str): The makePlayer argument to sweep, e.g. "cValue".
+        values (list): The values to try. They must be JSON numbers, strings or booleans.
+        games (int): Most games to play per value.
+        workers (int, optional): Number of processes, one per CPU by default. 1 plays in this process.
+        size (int, optional): Rows and columns of the board. Defaults to 8.
+        seed (int, optional): Seed the game seeds are drawn from, the same seeds for every value.
+            When None, the checkpoint's seed or a new one (see sweepSettings), so a resumed sweep plays the same games.
+        checkpoint (str, optional): JSON lines file every game is appended to, and resumed from.
+        ci_width (float, optional): Stop a value once the Wilson interval of x's win rate is within ci_width of it on each side.
+        min_games (int, optional): Games a value plays at least before it can stop early. Defaults to 10.
+        side (str, optional): 'x' to sweep config1, 'o' to sweep config2. Defaults to 'x'.
+
+    Yields:
+        dict: the result of tournament.playGame with the "value" it was played with, for each new game as it finishes.
+
+    Raises:
+        ValueError: the checkpoint is of another sweep, or the games are played in a pool and a
+            player searches in processes of its own (see tournament.checkPoolConfigs).
+    """
+    settings = sweepSettings(config1, config2, parameter, size, seed, side, checkpoint)
+    seed = settings["seed"]
+    header = None
+    done = []
+    if checkpoint is not None:
+        header, done = readCheckpoint(checkpoint)
+
+    counts = {value: [0, 0] for value in values}
+    played = set()
+    for result in done:
+        played.add((result["value"], result["game"]))
+        if result["value"] in counts:
+            counts[result["value"]][0] += 1
+            counts[result["value"]][1] += result["winner"] == 'X'
+
+    def finished(value):
+        count, wins = counts[value]
+        if ci_width is None or count < min_games:
+            return False
+        low, high = wilson(wins, count)
+        return (high - low) / 2 <= ci_width
+
+    pending = collections.deque()
+    for game, gameSeed in enumerate(tournament.gameSeeds(games, seed)):
+        for value in values:
+            if (value, game) not in played:
+                players = [dict(config1), dict(config2)]
+                players[side == 'o'][parameter] = value
+                pending.append((value, (game, size, size, players[0], players[1], gameSeed)))
+
+    def nextJob():
+        while pending:
+            job = pending.popleft()
+            if not finished(job[0]):
+                return job
+        return None
+
+    workers = min(workers or os.cpu_count(), max(len(pending), 1))
+    if workers > 1:
+        tournament.checkPoolConfigs([config for value, job in pending for config in job[3:5]])
+
+    log = None
+    if checkpoint is not None:
+        log = open(checkpoint, "a")
+        if header is None:
+            log.write(json.dumps({"sweep": settings}) + "\n")
+    try:
+        for result in _schedule(nextJob, workers):
+            counts[result["value"]][0] += 1
+            counts[result["value"]][1] += result["winner"] == 'X'
+            if log is not None:
+                log.write(json.dumps(result) + "\n")
+                log.flush()
+                os.fsync(log.fileno())
+            yield result
+    finally:
+        if log is not None:
+            log.close()
+
+
+def summarize(results: list) -> dict:
+    """x's wins and win rate with its Wilson interval, for every value of a sweep's results."""
+    counts = {}
+    for result in results:
+        count = counts.setdefault(result["value"], [0, 0])
+        count[0] += 1
+        count[1] += result["winner"] == 'X'
+    summary = {}
+    for value, (games, wins) in counts.items():
+        low, high = wilson(wins, games)
+        summary[value] = {"games": games, "x_wins": wins, "win_rate": wins / games, "low": low, "high": high}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games between two players for every value of one makePlayer argument.")
+    parser.add_argument("player1", help="JSON makePlayer arguments of x, without the symbol")
+    parser.add_argument("player2", help="JSON makePlayer arguments of o, without the symbol")
+    parser.add_argument("parameter", help="the makePlayer argument to sweep, e.g. cValue")
+    parser.add_argument("values", nargs="+", type=json.loads, help="JSON values to try")
+    parser.add_argument("--games", type=int, default=100, help="most games per value")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, one per CPU by default")
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--side", choices=["x", "o"], default="x", help="the player the parameter is set on")
+    parser.add_argument("--checkpoint", default=None, help="JSON lines file to record games in and resume from")
+    parser.add_argument("--ci-width", type=float, default=None, help="stop a value once its 95%% interval is this close")
+    parser.add_argument("--min-games", type=int, default=10)
+    parser.add_argument("--store", default=None, help="SQLite results store to add the games to, e.g. results.db")
+    args = parser.parse_args()
+    settings = sweepSettings(json.loads(args.player1), json.loads(args.player2), args.parameter, args.size, args.seed,
+                             args.side, args.checkpoint)
+    results = []
+    for result in runSweep(settings["config1"], settings["config2"], args.parameter, args.values, args.games, args.workers,
+                           args.size, settings["seed"], args.checkpoint, args.ci_width, args.min_games, args.side):
+        results.append(result)
+        print(json.dumps({key: result[key] for key in ("value", "game", "seed", "winner", "moves", "seconds")}), flush=True)
+    if args.checkpoint:
+        # the games of earlier runs too
+        results = readCheckpoint(args.checkpoint)[1]
+    if args.store and results:
+        # games of this sweep already in the store are not added again
+        with results_store.ResultsStore(args.store) as store:
+            store.addSweep(settings, results)
+    print(json.dumps(summarize(results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,33 @@
 import math
+import time
 
-import game_manager, game_rules, signal, unittest
-from player import makePlayer
-import json
+import game_manager, game_rules, signal, unittest, random
+import gc
+import weakref
+from unittest import mock
+import bitboard
+import zobrist
+import transposition
+import evaluation
+import mcts_tree
+import batch_rollout
+import graph_recorder
+import render
+import tournament
+import sweep
+import results_store
+import networkx
+import os
+from player import makePlayer, AlphaBetaPlayer, MonteCarloPlayer, Node, SIMULATIONS_PER_NODE
+import io
+import shutil
+import tempfile
 import numpy as np
 
+# makePlayer arguments of a quick MCTS player and a random one, for the tests that play whole games
+MC = {"playerType": 'c', "depth": 1, "numSimulate": 5, "cValue": 0.5, "sType": "random", "sdepth": 1, "make_graph": False, "engine": "bitboard"}
+RAND = dict(MC, playerType='r')
+
 class GameTest(unittest.TestCase):
 	def makeGame(self, size, player1, player2, depth=5, number_of_simulations=50, simulation_type='random', c_value=2.5, script=None, sdepth=5, make_graph = False) -> game_manager.GameManager:
 		"""Make a game with the given parameters.
@@ -40,12 +63,12 @@ class GameTest(unittest.TestCase):
 	def test1(self):
 		total = 0
 		print("Testing ...")
-		for i in range(100):
-			gm = self.makeGame(8, 'c', 'r', number_of_simulations=100, depth=3, simulation_type="random", c_value=0, sdepth=3, make_graph=False)
-			gm.play(PB=False)
-			if gm.GetWinner() == "X":
+		# the games are played in parallel, one process per CPU
+		mc = {"playerType": 'c', "depth": 3, "numSimulate": 100, "cValue": 0, "sType": "random", "sdepth": 3, "make_graph": False}
+		rand = dict(mc, playerType='r')
+		for i, result in enumerate(tournament.runTournament(mc, rand, 100, size=8)):
+			if result["winner"] == "X":
 				total += 1
-			# print(gm.GetWinner())
 			print("total: " + str(i+1) + " " + str(total) + "WINS")
 		print("total: " + str(total) + " " + str(total) + "WINS")
 		self.assertTrue(True)
@@ -55,13 +78,9 @@ class GameTest(unittest.TestCase):
 		Test different c_value
 		"""
 
-		print("Loading history ...")
-		with open('history.json', 'r') as f:
-			# read the last line
-			lines = f.readlines()
-			temp = json.loads(lines[-1])
-			num = temp['num']
-		print("History loaded")
+		# the results go into results.db, with the runs of the old history.json
+		store = results_store.ResultsStore('results.db')
+		store.importHistory('history.json')
 
 		cList = [round(x, 2) for x in list(np.arange(0, 0.401, 0.05))]
 		numGame = 100
@@ -71,39 +90,25 @@ class GameTest(unittest.TestCase):
 		player1 = 'c'
 		player2 = 'a'
 		result = {}
-		write = {}
 		depth = 3
 		sdepth = 3
 
+		# Every game is kept in the checkpoint as it finishes; if the sweep is stopped, running
+		# test2 again picks it up from there. The games are played in parallel, one process per CPU
+		checkpoint = 'sweep.jsonl'
+		mc = {"playerType": player1, "depth": depth, "numSimulate": simulatins, "cValue": 0, "sType": type, "sdepth": sdepth, "make_graph": False}
+		other = dict(mc, playerType=player2)
+		for i, game in enumerate(sweep.runSweep(mc, other, "cValue", cList, numGame, size=size, checkpoint=checkpoint)):
+			print(f"Game {i + 1}: c_value = {game['value']}, {game['winner']} wins")
+
+		print("writing to results.db ...")
+		settings, games = sweep.readCheckpoint(checkpoint)
+		store.addSweep(settings, games)
+		store.close()
+		os.remove(checkpoint)
+		summary = sweep.summarize(games)
 		for c in cList:
-			# Count the number of X win
-			print(f"Testing c_value = {c} ...")
-			numX = 0
-			for numG in range(numGame):
-				print(f"Game {numG + 1} ...")
-				gm = self.makeGame(size, player1, player2, number_of_simulations=simulatins, depth=depth, simulation_type=type, c_value=c, sdepth=sdepth)
-				gm.play(PB=False)
-				if gm.GetWinner() == 'X':
-					numX += 1
-				print(f"X win {numX} times")
-			result[round(c, 3)] = numX
-
-		print("writing to json ...")
-		write['num'] = num + 1
-		write['size'] = size
-		write['player1'] = player1
-		write['player2'] = player2
-		write['game'] = numGame
-		write['simulations'] = simulatins
-		write['ab depth'] = depth
-		write['simulation'] = type
-		write['simulation depth'] = sdepth
-		write['result'] = result
-
-		with open('history.json', 'a') as f:
-			# write to new line
-			f.write('\n')
-			json.dump(write, f)
+			result[round(c, 3)] = summary[c]["x_wins"]
 
 		print("Done!")
 		print(result)
@@ -114,8 +119,848 @@ class GameTest(unittest.TestCase):
 		gm = self.makeGame(8, 'c', 'r', number_of_simulations=20, depth=3, simulation_type="random", c_value=2.5, sdepth=3, make_graph=True)
 		gm.play(PB=False)
 		print(gm.GetWinner())
+		# the game only wrote the logs, draw every move into its .gif in parallel
+		for result in render.renderAll("process"):
+			print(result["gif"], result["frames"], "frames")
 		self.assertTrue(True)
 
 
+class GameManagerTest(unittest.TestCase):
+	def playRandomGame(self, seed, log):
+		random.seed(seed)
+		gm = game_manager.GameManager(6, 6, makePlayer('r', 'x', 1, 1, 1, 'random', 1, False), makePlayer('r', 'o', 1, 1, 1, 'random', 1, False), log=log)
+		gm.play(PB=False)
+		return gm
+
+	def test_headless(self):
+		"""
+		Headless and buffered games must play the same moves as a logged game
+		"""
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		path = os.path.join(directory, 'game.log')
+		winner = self.playRandomGame(3, path).GetWinner()
+		with open(path) as f:
+			logged = f.read()
+		buffer = io.StringIO()
+		gm = self.playRandomGame(3, buffer)
+		self.assertEqual(buffer.getvalue(), logged)
+		self.assertFalse(buffer.closed)
+		gm = self.playRandomGame(3, None)
+		self.assertEqual(gm.GetWinner(), winner)
+		self.assertEqual(len(gm.move_times), len(logged.splitlines()))
+
+	def test_move_spelling(self):
+		"""
+		A legal move written with lists must still be accepted, an illegal one refused
+		"""
+		gm = game_manager.GameManager(6, 6, makePlayer('d', 'x', 1, 1, 1, 'random', 1, False), makePlayer('d', 'o', 1, 1, 1, 'random', 1, False), log=None)
+		gm._takeTurn(PB=False)
+		gm._takeTurn(PB=False)
+		move = game_rules.getLegalMoves(gm.board, 'x')[0]
+		gm._takeTurn([list(move[0]), list(move[1])], PB=False)
+		self.assertEqual(gm.state, game_manager.O_TURN)
+		gm._takeTurn(((0, 0), (0, 1)), PB=False)
+		self.assertEqual(gm.state, game_manager.O_TURN)
+
+
+class GameRulesTest(unittest.TestCase):
+	def test_legal_moves_order(self):
+		"""
+		getLegalMoves must list the same moves in the same order as the
+		original scan over every (own piece, empty square) pair
+		"""
+		rng = random.Random(1)
+		for size in [4, 5, 8]:
+			for _ in range(10):
+				board = game_rules.makeBoard(size, size)
+				board[0][0] = " "
+				board[0][1] = " "
+				player = 'x'
+				while True:
+					empties = game_rules.getEmptySquares(board)
+					mine = [(r, c) for r in range(size) for c in range(size) if board[r][c] == player]
+					expected = [(o, d) for o in mine for d in empties if game_rules.isLegalMove(board, player, (o, d), False)]
+					moves = game_rules.getLegalMoves(board, player)
+					self.assertEqual(moves, expected)
+					if not moves:
+						break
+					board = game_rules.makeMove(board, rng.choice(moves))
+					player = 'o' if player == 'x' else 'x'
+
+	def test_apply_and_undo_move(self):
+		rng = random.Random(2)
+		board = game_rules.makeBoard(8, 8)
+		board[0][0] = " "
+		board[0][1] = " "
+		player = 'x'
+		undos = []
+		history = []
+		moves = game_rules.getLegalMoves(board, player)
+		while moves:
+			move = rng.choice(moves)
+			expected = game_rules.makeMove(board, move)
+			history.append([row[:] for row in board])
+			undos.append(game_rules.applyMove(board, move))
+			self.assertEqual(board, expected)
+			player = 'o' if player == 'x' else 'x'
+			moves = game_rules.getLegalMoves(board, player)
+		while undos:
+			game_rules.undoMove(board, undos.pop())
+			self.assertEqual(board, history.pop())
+
+
+class ZobristTest(unittest.TestCase):
+	def test_incremental_key(self):
+		"""
+		Keys updated move by move must match keys computed from scratch
+		"""
+		rng = random.Random(4)
+		board = game_rules.makeBoard(6, 8)
+		board[0][0] = " "
+		board[0][1] = " "
+		player = 'x'
+		key = zobrist.hashBoard(board, player)
+		keys = [key]
+		undos = []
+		moves = game_rules.getLegalMoves(board, player)
+		while moves:
+			key, undo = zobrist.applyMove(board, rng.choice(moves), key)
+			undos.append(undo)
+			player = 'o' if player == 'x' else 'x'
+			self.assertEqual(key, zobrist.hashBoard(board, player))
+			self.assertNotIn(key, keys)
+			keys.append(key)
+			moves = game_rules.getLegalMoves(board, player)
+		while undos:
+			key = zobrist.undoMove(board, undos.pop(), key)
+			keys.pop()
+			self.assertEqual(key, keys[-1])
+
+	def test_side_to_move(self):
+		board = game_rules.makeBoard(8, 8)
+		self.assertNotEqual(zobrist.hashBoard(board, 'x'), zobrist.hashBoard(board, 'o'))
+		self.assertEqual(zobrist.getTable(8, 8), zobrist.getTable(8, 8))
+
+
+class AlphaBetaTest(unittest.TestCase):
+	def playRandomPositions(self, size, seed):
+		"""
+		Yields (board, player to move) along a random game
+		"""
+		rng = random.Random(seed)
+		board = game_rules.makeBoard(size, size)
+		board[0][0] = " "
+		board[0][1] = " "
+		player = 'x'
+		moves = game_rules.getLegalMoves(board, player)
+		while moves:
+			yield board, player
+			board = game_rules.makeMove(board, rng.choice(moves))
+			player = 'o' if player == 'x' else 'x'
+			moves = game_rules.getLegalMoves(board, player)
+
+	def test_transposition_table(self):
+		"""
+		A transposition table must not change the value of the root
+		"""
+		players = {s: (AlphaBetaPlayer(s, 3), AlphaBetaPlayer(s, 3, 4096)) for s in 'xo'}
+		for board, player in self.playRandomPositions(6, 0):
+			plain, cached = players[player]
+			cached.tt.newSearch()
+			self.assertEqual(plain.AlphaBetaSearch(board)[0], cached.AlphaBetaSearch(board)[0])
+		self.assertGreater(players['x'][1].tt.hits, 0)
+
+	def test_move_ordering(self):
+		"""
+		Move ordering must not change the value of the root, only how much is searched
+		"""
+		plainNodes = orderedNodes = 0
+		for board, player in self.playRandomPositions(6, 2):
+			# neither has a transposition table, so the difference in nodes is the ordering alone
+			plain, ordered = AlphaBetaPlayer(player, 3, 0, None, False), AlphaBetaPlayer(player, 3, 0, None, True)
+			self.assertEqual(plain.AlphaBetaSearch(board)[0], ordered.AlphaBetaSearch(board)[0])
+			plain.getMove(board)
+			ordered.getMove(board)
+			plainNodes += plain.nodes
+			orderedNodes += ordered.nodes
+		self.assertLess(orderedNodes, plainNodes)
+
+	def test_parallel_root_search(self):
+		"""
+		Splitting the root moves across processes must pick the same move as the serial search,
+		with one pool kept from move to move until close()
+		"""
+		parallel = {symbol: AlphaBetaPlayer(symbol, 3, workers=2) for symbol in 'xo'}
+		pools = {}
+		for board, player in self.playRandomPositions(6, 3):
+			self.assertEqual(AlphaBetaPlayer(player, 3).getMove(board), parallel[player].getMove(board))
+			if parallel[player].pool is not None:
+				self.assertIs(pools.setdefault(player, parallel[player].pool), parallel[player].pool)
+		self.assertTrue(pools)
+		for symbol in 'xo':
+			parallel[symbol].close()
+			self.assertIsNone(parallel[symbol].pool)
+		# iterative deepening searches in this process only
+		with self.assertRaises(ValueError):
+			AlphaBetaPlayer('x', None, 4096, 1.0, workers=2)
+
+	def fakeClock(self):
+		"""
+		A time.time where every read takes a millisecond, so a budget runs out after a fixed amount of search
+		"""
+		clock = [0.0]
+		def tick():
+			clock[0] += 0.001
+			return clock[0]
+		return clock, tick
+
+	def test_time_budget(self):
+		"""
+		A timed search must stop at its budget with a legal move and leave the board as it was
+		"""
+		clock, tick = self.fakeClock()
+		timed = AlphaBetaPlayer('x', None, 4096, 0.2)
+		with mock.patch('time.time', tick):
+			for board, player in self.playRandomPositions(8, 1):
+				if player != 'x':
+					continue
+				before = [row[:] for row in board]
+				start = clock[0]
+				move = timed.getMove(board)
+				# one read sets the deadline and every node checks it, so the search stops one read past it
+				self.assertLess(clock[0] - start, 0.2 + 0.0025)
+				self.assertIn(move, game_rules.getLegalMoves(board, 'x'))
+				self.assertEqual(board, before)
+
+	def test_deepening_stops(self):
+		"""
+		Without a depth limit, deepening must stop once the search reaches the end of every game
+		"""
+		clock, tick = self.fakeClock()
+		with mock.patch('time.time', tick):
+			for board, player in list(self.playRandomPositions(6, 4))[-6:]:
+				timed = AlphaBetaPlayer(player, None, 4096, 1000)
+				move = timed.getMove(board)
+				self.assertIn(move, game_rules.getLegalMoves(board, player))
+				plies = 2 * min(game_rules.countPieces(board, 'x'), game_rules.countPieces(board, 'o')) + 1
+				self.assertEqual(timed.completed_depth, plies)
+				# deeper searches would give the same value, moves may differ on ties
+				self.assertEqual(timed.IterativeDeepeningSearch(board)[0], AlphaBetaPlayer(player, plies).AlphaBetaSearch(board)[0])
+		self.assertLess(clock[0], 1000)
+
+
+class EvaluationTest(unittest.TestCase):
+	def test_mobility(self):
+		"""
+		Counted mobility must match the length of the move list
+		"""
+		rng = random.Random(5)
+		for size in [4, 7, 10]:
+			board = game_rules.makeBoard(size, size)
+			for symbol in 'xo':
+				self.assertEqual(game_rules.countLegalMoves(board, symbol), len(game_rules.getLegalMoves(board, symbol)))
+			board[0][0] = " "
+			board[0][1] = " "
+			player = 'x'
+			while True:
+				for symbol in 'xo':
+					self.assertEqual(game_rules.countLegalMoves(board, symbol), len(game_rules.getLegalMoves(board, symbol)))
+				moves = game_rules.getLegalMoves(board, player)
+				if not moves:
+					break
+				game_rules.applyMove(board, rng.choice(moves))
+				player = 'o' if player == 'x' else 'x'
+
+	def test_evaluators(self):
+		board = game_rules.makeBoard(6, 6)
+		board[2][2] = " "
+		board[2][3] = " "
+		self.assertEqual(evaluation.getEvaluator("mobility")(board, 'x'), -len(game_rules.getLegalMoves(board, 'o')))
+		for name in evaluation.EVALUATORS:
+			self.assertIsInstance(evaluation.getEvaluator(name)(board, 'o'), int)
+		with self.assertRaises(ValueError):
+			evaluation.getEvaluator("unknown")
+
+
+class MonteCarloTest(unittest.TestCase):
+	def makeBoard(self):
+		board = game_rules.makeBoard(6, 6)
+		board[2][2] = " "
+		board[2][3] = " "
+		return board
+
+	def test_reuse_tree(self):
+		"""
+		The opponent's reply must be found in the kept tree, with its statistics
+		"""
+		random.seed(0)
+		mc = MonteCarloPlayer('x', 60, 0.5, 'random', 1, False, reuse_tree=True)
+		board = game_rules.makeMove(self.makeBoard(), mc.getMove(self.makeBoard()))
+		self.assertIsNotNone(mc.root)
+		self.assertIsNone(mc.root.parent)
+		reply = max(mc.root.children, key=lambda child: child.visits)
+		board = game_rules.makeMove(board, reply.move)
+		root = mc.find_root(board)
+		self.assertIs(root, reply)
+		self.assertGreater(root.visits, 0)
+		self.assertIn(mc.getMove(board), game_rules.getLegalMoves(board, 'x'))
+		self.assertGreater(root.visits, 60)
+
+	def test_reuse_tree_frees(self):
+		"""
+		With reuse_tree, the roots of earlier moves must be freed once the search has moved on
+		"""
+		random.seed(0)
+		mc = MonteCarloPlayer('x', 60, 0.5, 'random', 1, False, reuse_tree=True)
+		board = self.makeBoard()
+		roots = []
+		for _ in range(4):
+			board = game_rules.makeMove(board, mc.getMove(board))
+			roots.append(weakref.ref(mc.root))
+			board = game_rules.makeMove(board, random.choice(game_rules.getLegalMoves(board, 'o')))
+		gc.collect()
+		self.assertEqual([root() is None for root in roots], [True, True, True, False])
+
+	def test_array_tree(self):
+		"""
+		The array-backed tree must make exactly the same search as the Node tree
+		"""
+		for seed in range(3):
+			moves = []
+			for store in ['node', 'array']:
+				random.seed(seed)
+				mc = MonteCarloPlayer('x', 150, 0.5, 'random', 1, False, tree_store=store)
+				moves.append(mc.getMove(self.makeBoard()))
+			self.assertEqual(moves[0], moves[1])
+		self.assertGreater(mc.tree_stats['nodes'], 150)
+		self.assertEqual(mc.tree_stats['bytes_per_node'], 25)
+
+	def test_vectorised_select(self):
+		"""
+		Batched ucb1 selection must pick the same child as the scalar loop, ties included
+		"""
+		rng = random.Random(6)
+		for _ in range(300):
+			n = rng.randint(mcts_tree.VECTOR_MIN_CHILDREN, 2 * mcts_tree.VECTOR_MIN_CHILDREN)
+			tree = mcts_tree.ArrayTree(self.makeBoard(), 'x')
+			tree.expand(0, [((0, 0), (0, 2))] * n)
+			tree.visits[0] = rng.choice([0, rng.randint(1, 500)])
+			for child in range(1, n + 1):
+				tree.visits[child] = rng.choice([0, 3, rng.randint(1, 20)])
+				tree.values[child] = rng.randint(0, tree.visits[child])
+			c = rng.choice([0, 0.35, 2.5])
+			scores = [tree.ucb1(child, c) for child in range(1, n + 1)]
+			self.assertEqual(tree.select(0, c), 1 + scores.index(max(scores)))
+
+		# the Node store scores its children from their slots in the parent, batched from VECTOR_MIN_CHILDREN up
+		for _ in range(300):
+			n = rng.randint(1, 2 * mcts_tree.VECTOR_MIN_CHILDREN)
+			c = rng.choice([0, 0.35, 2.5])
+			mc = MonteCarloPlayer('x', 10, c, 'random', 1, False)
+			root = Node(None, c, 'x')
+			for _ in range(n):
+				root.add_child(Node(None, c, 'o', parent=root))
+			root.visits = rng.choice([0, rng.randint(1, 500)])
+			for child in root.children:
+				child.visits = rng.choice([0, 3, rng.randint(1, 20)])
+				child.value = rng.randint(0, child.visits)
+			self.assertEqual(list(root.child_visits), [child.visits for child in root.children])
+			scores = [child.ucb1() for child in root.children]
+			self.assertIs(mc.select(root), root.children[scores.index(max(scores))])
+		root.children[0].update('o')
+		self.assertEqual((root.child_visits[0], root.child_values[0]), (root.children[0].visits, root.children[0].value))
+		children = root.children
+		root.clear_children()
+		self.assertEqual((len(root.child_visits), children[0].slots), (0, []))
+
+	def test_parallel(self):
+		"""
+		Root and tree parallel searches must run every simulation and return a legal move,
+		with one pool kept from move to move until close()
+		"""
+		board = self.makeBoard()
+		legal = game_rules.getLegalMoves(board, 'x')
+		for mode, store in [('root', 'node'), ('root', 'array'), ('tree', 'node')]:
+			random.seed(1)
+			mc = MonteCarloPlayer('x', 40, 0.5, 'random', 1, False, tree_store=store, parallel=mode, workers=2)
+			self.assertIn(mc.getMove(board), legal)
+			self.assertEqual(mc.simulation_count, 40)
+			# the next move runs in the same pool
+			pool = mc.pool
+			self.assertIn(mc.getMove(board), legal)
+			self.assertIs(mc.pool, pool)
+			mc.close()
+			self.assertIsNone(mc.pool)
+		with self.assertRaises(ValueError):
+			MonteCarloPlayer('x', 40, 0.5, 'random', 1, False, parallel='root', reuse_tree=True)
+
+	def test_transpositions(self):
+		"""
+		With transpositions a position must be one node, shared by every parent reaching it
+		"""
+		random.seed(3)
+		board = self.makeBoard()
+		mc = MonteCarloPlayer('x', 800, 0.5, 'random', 1, False, engine='bitboard', transpositions=True)
+		self.assertIn(mc.getMove(board), game_rules.getLegalMoves(board, 'x'))
+		root = mc.table[zobrist.hashBoard(board, 'x')]
+		self.assertEqual(root.visits, 800)
+		parents = {}
+		for node in mc.table.values():
+			self.assertEqual(node.key, zobrist.hashBoard(node.state, node.player))
+			for child in node.children:
+				self.assertIs(mc.table[child.key], child)
+				parents[child.key] = parents.get(child.key, 0) + 1
+		self.assertGreater(max(parents.values()), 1)
+		self.assertEqual(mc.tree_stats['transposition_hits'], sum(parents.values()) - len(parents))
+		with self.assertRaises(ValueError):
+			MonteCarloPlayer('x', 10, 0.5, 'random', 1, False, tree_store='array', transpositions=True)
+
+	def test_max_tree_size(self):
+		"""
+		The tree must be pruned back under max_tree_size, and the node count must stay exact
+		"""
+		board = self.makeBoard()
+		for transpositions in [False, True]:
+			random.seed(4)
+			mc = MonteCarloPlayer('x', 600, 0.5, 'random', 1, False, engine='bitboard', transpositions=transpositions, max_tree_size=200)
+			self.assertIn(mc.getMove(board), game_rules.getLegalMoves(board, 'x'))
+			self.assertGreater(mc.search_stats['pruned'], 0)
+			self.assertLessEqual(mc.live_nodes, 200)
+
+		random.seed(4)
+		mc = MonteCarloPlayer('x', 600, 0.5, 'random', 1, False, engine='bitboard', max_tree_size=200, reuse_tree=True)
+		def checkedPrune(root):
+			self.assertEqual(len(mc.reachable(root)), mc.live_nodes)
+			MonteCarloPlayer.prune_tree(mc, root)
+		mc.prune_tree = checkedPrune
+		mc.getMove(board)
+		self.assertLessEqual(len(mc.reachable(mc.root)), 200)
+		with self.assertRaises(ValueError):
+			MonteCarloPlayer('x', 10, 0.5, 'random', 1, False, tree_store='array', max_tree_size=200)
+
+	def test_rollout_plies(self):
+		"""
+		Simulations must stop after rollout_plies and be decided by the evaluator
+		"""
+		board = self.makeBoard()
+		board = game_rules.makeMove(board, game_rules.getLegalMoves(board, 'x')[0])
+		self.assertGreater(evaluation.mobilityDiff(board, 'o'), 0)
+		for engine, rollouts in [('list', 1), ('bitboard', 1), ('list', 4)]:
+			random.seed(5)
+			mc = MonteCarloPlayer('o', 10, 0.5, 'random', 1, False, engine=engine, rollouts_per_leaf=rollouts, rollout_plies=0, rollout_scale=100)
+			state, losers = mc.simulate_leaf(board, 'o')
+			self.assertEqual(state, board)
+			self.assertEqual(losers, ['x'] * rollouts)
+
+		# a large scale must not overflow on a losing score, and decides the loser outright
+		self.assertLess(evaluation.mobilityDiff(board, 'x'), 0)
+		mc = MonteCarloPlayer('o', 10, 0.5, 'random', 1, False, rollout_plies=0, rollout_scale=1000)
+		self.assertEqual([mc.cutoff_loser(board, 'x'), mc.cutoff_loser(board, 'o')], ['x', 'x'])
+
+		random.seed(5)
+		mc = MonteCarloPlayer('o', 10, 0.5, 'random', 1, False, rollout_plies=0, rollout_scale=0)
+		losers = [mc.simulate(board, 'o')[1] for _ in range(400)]
+		self.assertTrue(150 < losers.count('x') < 250)
+
+		random.seed(5)
+		mc = MonteCarloPlayer('o', 10, 0.5, 'alphabeta', 1, False, rollout_plies=2)
+		pieces = game_rules.countPieces(board, 'x') + game_rules.countPieces(board, 'o')
+		state, loser = mc.simulate(board, 'o')
+		self.assertIn(loser, ['x', 'o'])
+		self.assertGreaterEqual(game_rules.countPieces(state, 'x') + game_rules.countPieces(state, 'o'), pieces - 4)
+
+	def test_rollout_cache(self):
+		"""
+		Cached alpha-beta simulations must play the same moves, and the cache must stay within its size
+		"""
+		board = self.makeBoard()
+		moves = []
+		for cache in [0, 5000]:
+			random.seed(7)
+			mc = MonteCarloPlayer('x', 40, 0.5, 'alphabeta', 1, False, rollout_cache=cache)
+			moves.append(mc.getMove(board))
+		self.assertEqual(moves[0], moves[1])
+		self.assertGreater(mc.search_stats['rollout_cache']['hits'], 0)
+
+		for scope in ['search', 'game']:
+			mc = MonteCarloPlayer('x', 40, 0.5, 'alphabeta', 1, False, rollout_cache=20, rollout_cache_scope=scope)
+			mc.getMove(board)
+			self.assertLessEqual(len(mc.rollout_cache), 20)
+			self.assertGreater(mc.rollout_cache.evictions, 0)
+			mc.start_search()
+			self.assertEqual(len(mc.rollout_cache) > 0, scope == 'game')
+
+		cache = transposition.LRUCache(2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		self.assertEqual(cache.get('a'), 1)
+		cache.put('c', 3)
+		self.assertIsNone(cache.get('b'))
+		self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+		self.assertEqual(cache.stats()['evictions'], 1)
+
+	def test_graph_log(self):
+		"""
+		make_graph must stream the move to a log that replays into the searched tree,
+		writing an update only when a node's labels change
+		"""
+		random.seed(8)
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		mc = MonteCarloPlayer('x', 100, 0.5, 'random', 1, True, graph_dir=directory)
+		roots = []
+		find_root = mc.find_root
+		mc.find_root = lambda board: roots.append(find_root(board)) or roots[-1]
+		mc.getMove(self.makeBoard())
+		self.assertIsNone(mc.recorder)
+		path = graph_recorder.logPath(directory, 1)
+		replay = graph_recorder.GraphReplay(path)
+		stats = {}
+		for event in graph_recorder.readEvents(path):
+			if event['op'] == 'update':
+				self.assertNotEqual(stats[event['id']], event['stats'])
+			if 'stats' in event:
+				stats[event['id']] = event['stats']
+			replay.seek(replay.applied)
+		self.assertEqual(replay.tree.number_of_nodes(), 1 + mc.tree_nodes)
+		self.assertEqual(replay.tree.number_of_edges(), mc.tree_nodes)
+		self.assertEqual(replay.labels[0][2], "Visits: 100")
+		# only the nodes on each path and their children are updated, and that must leave every label current
+		pairs = [(0, roots[0])]
+		for node_id, node in pairs:
+			self.assertEqual(replay.labels[node_id], graph_recorder.labels(mc.board_to_graph_string(node.state), mc.graph_stats(node)))
+			pairs.extend(zip(sorted(replay.tree.successors(node_id)), node.children))
+		self.assertEqual(len(pairs), 1 + mc.tree_nodes)
+
+	def test_graph_log_closed(self):
+		"""
+		A search that raises must still close its log
+		"""
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		mc = MonteCarloPlayer('x', 10, 0.5, 'random', 1, True, graph_dir=directory)
+		files = []
+		def fail(root_node, number_of_simulations):
+			files.append(mc.recorder.file)
+			raise RuntimeError("search failed")
+		mc.run_simulations = fail
+		with self.assertRaises(RuntimeError):
+			mc.getMove(self.makeBoard())
+		self.assertIsNone(mc.recorder)
+		self.assertTrue(files[0].closed)
+
+	def test_render(self):
+		"""
+		Rendering a log must draw one frame per event, laying out only when the tree changes shape
+		"""
+		random.seed(9)
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		mc = MonteCarloPlayer('x', 2, 0.5, 'random', 1, True, graph_dir=directory)
+		mc.getMove(self.makeBoard())
+		path = graph_recorder.logPath(directory, 1)
+		events = list(graph_recorder.readEvents(path))
+		layout = lambda tree: networkx.spring_layout(tree, seed=0)
+		result = render.renderLog(path, layout=layout, figsize=(3, 2))
+		self.assertTrue(os.path.getsize(result['gif']) > 0)
+		self.assertEqual(result['frames'], len(events))
+		self.assertEqual(result['layouts'], len([event for event in events if event['op'] != 'update']))
+		self.assertLess(result['layouts'], result['frames'])
+
+	def test_budget(self):
+		"""
+		With a budget the search must run until it is spent and play the most visited child
+		"""
+		board = self.makeBoard()
+		for store in ['node', 'array']:
+			random.seed(2)
+			mc = MonteCarloPlayer('x', 1, 0.5, 'random', 1, False, tree_store=store, max_time=0.2)
+			start = time.time()
+			mc.getMove(board)
+			self.assertGreaterEqual(time.time() - start, 0.2)
+			self.assertGreater(mc.search_stats['simulations'], 1)
+			self.assertGreater(mc.search_stats['simulations_per_second'], 0)
+
+		random.seed(2)
+		mc = MonteCarloPlayer('x', 1, 0.5, 'random', 1, False, max_nodes=100)
+		self.assertIn(mc.getMove(board), game_rules.getLegalMoves(board, 'x'))
+		self.assertGreaterEqual(mc.search_stats['nodes'], 100)
+
+		# the whole game left from here is 15 positions, far fewer than the budget
+		endgame = [list(row) for row in ["      ", "   x x", "x     ", "      ", "x     ", "oxo o "]]
+		for store, parallel in [('node', None), ('array', None), ('node', 'root')]:
+			random.seed(2)
+			mc = MonteCarloPlayer('o', 1, 0.5, 'random', 1, False, tree_store=store, max_nodes=500, parallel=parallel, workers=2 if parallel else 1)
+			self.assertIn(mc.getMove(endgame), game_rules.getLegalMoves(endgame, 'o'))
+			mc.close()
+			# it stops once max_nodes simulations in a row add nothing, well before the hard cap
+			self.assertLess(mc.search_stats['simulations'], SIMULATIONS_PER_NODE * 500)
+
+		root = Node(board, 0.5, 'x')
+		mc.expand(root, game_rules.getLegalMoves(board, 'x'))
+		for child, (visits, value) in zip(root.children, [(3, 3), (9, 1), (9, 8), (1, 1)]):
+			child.visits, child.value = visits, value
+		root.visits = 22
+		self.assertIs(mc.best_child(root), root.children[1])
+
+
+class BatchRolloutTest(unittest.TestCase):
+	def test_legal_moves(self):
+		"""
+		Batched move counts must match game_rules on positions from random games
+		"""
+		random.seed(4)
+		boards = []
+		for size in [(6, 6), (5, 8)]:
+			for _ in range(20):
+				board = game_rules.makeBoard(*size)
+				board[2][2] = " "
+				board[2][3] = " "
+				symbol = random.choice(['x', 'o'])
+				for _ in range(random.randint(0, 12)):
+					moves = game_rules.getLegalMoves(board, symbol)
+					if not moves:
+						break
+					board = game_rules.makeMove(board, random.choice(moves))
+					symbol = 'o' if symbol == 'x' else 'x'
+				boards.append(board)
+			stack = np.stack([batch_rollout.fromList(board) for board in boards])
+			for symbol in ['x', 'o']:
+				counts = batch_rollout.countLegalMoves(stack, symbol)
+				self.assertEqual(list(counts), [len(game_rules.getLegalMoves(board, symbol)) for board in boards])
+			boards = []
+
+	def test_playouts(self):
+		"""
+		Every playout must end with its loser stuck, having only lost pieces
+		"""
+		random.seed(5)
+		board = game_rules.makeBoard(6, 6)
+		board[2][2] = " "
+		board[2][3] = " "
+		states, losers = batch_rollout.randomPlayouts(board, 'x', 50)
+		self.assertEqual(len(losers), 50)
+		self.assertEqual(set(losers), {'x', 'o'})
+		for state, loser in zip(states, losers):
+			final = batch_rollout.toList(state)
+			self.assertEqual(game_rules.getLegalMoves(final, loser), [])
+			for symbol in ['x', 'o']:
+				self.assertLessEqual(game_rules.countPieces(final, symbol), game_rules.countPieces(board, symbol))
+		self.assertEqual(batch_rollout.toList(batch_rollout.fromList(board)), board)
+
+	def test_rollouts_per_leaf(self):
+		"""
+		Each leaf must be simulated rollouts_per_leaf times
+		"""
+		random.seed(6)
+		board = game_rules.makeBoard(6, 6)
+		board[2][2] = " "
+		board[2][3] = " "
+		mc = MonteCarloPlayer('x', 30, 0.5, 'random', 1, False, rollouts_per_leaf=8)
+		self.assertIn(mc.getMove(board), game_rules.getLegalMoves(board, 'x'))
+		self.assertEqual(mc.simulation_count, 240)
+
+
+class TournamentTest(unittest.TestCase):
+	def test_tournament(self):
+		"""
+		Parallel games must give the same results as serial ones, each with its per-move timing
+		"""
+		runs = [sorted(tournament.runTournament(MC, RAND, 4, workers=workers, size=6, seed=11), key=lambda result: result["game"]) for workers in [1, 2]]
+		for serial, parallel in zip(*runs):
+			self.assertEqual([serial[key] for key in ("game", "seed", "winner", "moves")], [parallel[key] for key in ("game", "seed", "winner", "moves")])
+		self.assertEqual([result["game"] for result in runs[0]], [0, 1, 2, 3])
+		for result in runs[1]:
+			self.assertIn(result["winner"], ["X", "O"])
+			self.assertEqual(len(result["move_times"]), result["moves"])
+			self.assertGreater(result["moves"], 2)
+		summary = tournament.summarize(runs[1])
+		self.assertEqual(summary["x_wins"] + summary["o_wins"], 4)
+
+	def test_parallel_players(self):
+		"""
+		A player with processes of its own must be refused by a pool of games, and play when the games are played here
+		"""
+		for config in [dict(MC, parallel='root', workers=2), dict(MC, playerType='a', workers=2)]:
+			with self.assertRaises(ValueError):
+				list(tournament.runTournament(config, RAND, 2, workers=2, size=6, seed=1))
+			self.assertIn(list(tournament.runTournament(config, RAND, 1, workers=1, size=6, seed=1))[0]["winner"], ["X", "O"])
+
+
+class SweepTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+		self.checkpoint = os.path.join(self.directory, "sweep.jsonl")
+
+	def games(self, results):
+		return sorted((result["value"], result["game"], result["seed"], result["winner"], result["moves"]) for result in results)
+
+	def test_resume(self):
+		"""
+		A sweep stopped part way, with its last line cut short, must finish with the same games as one run in one go
+		"""
+		whole = list(sweep.runSweep(MC, RAND, "cValue", [0, 0.5], 3, workers=2, size=6, seed=3))
+		self.assertEqual(len(whole), 6)
+		# every value plays the same seeds
+		seeds = {(result["game"], result["seed"]) for result in whole}
+		self.assertEqual(len(seeds), 3)
+
+		first = sweep.runSweep(MC, RAND, "cValue", [0, 0.5], 3, workers=1, size=6, seed=3, checkpoint=self.checkpoint)
+		for i in range(4):
+			next(first)
+		first.close()
+		with open(self.checkpoint, "a") as file:
+			file.write('{"value": 0.5, "ga')
+		header, done = sweep.readCheckpoint(self.checkpoint)
+		self.assertEqual(header["parameter"], "cValue")
+		self.assertEqual(len(done), 4)
+
+		rest = list(sweep.runSweep(MC, RAND, "cValue", [0, 0.5], 3, workers=2, size=6, seed=3, checkpoint=self.checkpoint))
+		self.assertEqual(len(rest), 2)
+		self.assertEqual(self.games(sweep.readCheckpoint(self.checkpoint)[1]), self.games(whole))
+		self.assertEqual(list(sweep.runSweep(MC, RAND, "cValue", [0, 0.5], 3, size=6, checkpoint=self.checkpoint)), [])
+		with self.assertRaises(ValueError):
+			list(sweep.runSweep(MC, MC, "cValue", [0, 0.5], 3, size=6, checkpoint=self.checkpoint))
+
+	def test_parallel_players(self):
+		"""
+		A sweep giving a player processes of its own must be refused by a pool of games before it starts
+		"""
+		with self.assertRaises(ValueError):
+			list(sweep.runSweep(MC, RAND, "workers", [1, 2], 2, workers=2, size=6, seed=3, checkpoint=self.checkpoint))
+		self.assertFalse(os.path.exists(self.checkpoint))
+		results = list(sweep.runSweep(MC, RAND, "workers", [1, 2], 1, workers=1, size=6, seed=3))
+		self.assertEqual(sorted(result["value"] for result in results), [1, 2])
+
+	def test_settings(self):
+		"""
+		The settings of a sweep must hold the seed its games were drawn from
+		"""
+		settings = sweep.sweepSettings(MC, RAND, "cValue", size=6)
+		self.assertIsInstance(settings["seed"], int)
+		first = list(sweep.runSweep(MC, RAND, "cValue", [0], 2, workers=1, size=6, seed=settings["seed"]))
+		again = list(sweep.runSweep(settings["config1"], settings["config2"], "cValue", [0], 2, workers=1, size=6, seed=settings["seed"]))
+		self.assertEqual(self.games(first), self.games(again))
+
+		list(sweep.runSweep(MC, RAND, "cValue", [0], 1, workers=1, size=6, checkpoint=self.checkpoint))
+		header = sweep.readCheckpoint(self.checkpoint)[0]
+		self.assertEqual(sweep.sweepSettings(MC, RAND, "cValue", size=6, checkpoint=self.checkpoint), header)
+		with self.assertRaises(ValueError):
+			sweep.sweepSettings(MC, RAND, "cValue", size=8, checkpoint=self.checkpoint)
+
+	def test_early_stop(self):
+		"""
+		A value stops once its interval is narrow enough, the others play all their games
+		"""
+		results = list(sweep.runSweep(MC, RAND, "numSimulate", [1, 2], 6, workers=1, size=6, seed=5, ci_width=1.0, min_games=2))
+		summary = sweep.summarize(results)
+		self.assertEqual([summary[value]["games"] for value in [1, 2]], [2, 2])
+		results = list(sweep.runSweep(MC, RAND, "numSimulate", [1, 2], 6, workers=1, size=6, seed=5, ci_width=0.01, min_games=2))
+		self.assertEqual([sweep.summarize(results)[value]["games"] for value in [1, 2]], [6, 6])
+
+	def test_wilson(self):
+		self.assertEqual(sweep.wilson(0, 0), (0.0, 1.0))
+		low, high = sweep.wilson(50, 100)
+		self.assertAlmostEqual(low, 0.4038, places=4)
+		self.assertAlmostEqual(high, 0.5962, places=4)
+		low, high = sweep.wilson(10, 10)
+		self.assertLess(low, 1.0)
+		self.assertEqual(high, 1.0)
+
+
+class ResultsStoreTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+		self.store = results_store.ResultsStore(os.path.join(self.directory, "results.db"))
+		# cleanups run last first, so the store is closed before its directory goes
+		self.addCleanup(self.store.close)
+
+	def test_tournament_and_sweep(self):
+		"""
+		Games must come back as they were played, and win rates must count sweeps by their own value
+		"""
+		results = list(tournament.runTournament(MC, RAND, 3, workers=1, size=6, seed=2))
+		run = self.store.addTournament(MC, RAND, results, size=6, seed=2)
+		self.assertEqual(self.store.games(run), [dict(result, value=None) for result in sorted(results, key=lambda result: result["game"])])
+		self.assertEqual(self.store.parameters(run), [MC, RAND])
+
+		checkpoint = os.path.join(self.directory, "sweep.jsonl")
+		games = list(sweep.runSweep(MC, RAND, "cValue", [0, 0.5], 2, workers=1, size=6, seed=2, checkpoint=checkpoint))
+		settings, games = sweep.readCheckpoint(checkpoint)
+		run = self.store.addSweep(settings, games)
+		self.assertNotIn("cValue", self.store.parameters(run)[0])
+		self.assertEqual([row["games"] for row in self.store.runs()], [3, 4])
+
+		# a resumed sweep adds its checkpoint again, with one more game per value
+		self.assertEqual(self.store.addSweep(settings, games), run)
+		list(sweep.runSweep(MC, RAND, "cValue", [0, 0.5], 3, workers=1, size=6, seed=2, checkpoint=checkpoint))
+		self.assertEqual(self.store.addSweep(*sweep.readCheckpoint(checkpoint)), run)
+		self.assertEqual([row["games"] for row in self.store.runs()], [3, 6])
+		self.store.addSweep(settings, games)
+		self.assertEqual([row["games"] for row in self.store.runs()], [3, 6])
+
+		rates = self.store.winRates("cValue")
+		self.assertEqual([(rate["value"], rate["games"]) for rate in rates], [(0, 3), (0.5, 6)])
+		games = sweep.readCheckpoint(checkpoint)[1]
+		x_wins = sum(game["winner"] == 'X' for game in games if game["value"] == 0.5) + sum(result["winner"] == 'X' for result in results)
+		self.assertEqual(rates[1]["x_wins"], x_wins)
+		self.assertLessEqual(rates[1]["low"], rates[1]["win_rate"])
+		self.assertEqual([rate["games"] for rate in self.store.winRates("cValue", where={"o.playerType": 'r', "x.engine": "bitboard"})], [3, 6])
+		self.assertEqual(self.store.winRates("cValue", where={"o.playerType": 'a'}), [])
+		self.assertEqual(self.store.winRates("cValue", size=8), [])
+		self.assertEqual([rate["value"] for rate in self.store.winRates("playerType", side='o')], ['r'])
+
+	def test_import_history(self):
+		"""
+		The old history.json must import once, with its win counts
+		"""
+		runs = self.store.importHistory("history.json")
+		self.assertEqual(len(runs), 3)
+		self.assertEqual(self.store.importHistory("history.json"), [])
+		rates = {rate["value"]: rate for rate in self.store.winRates("cValue", where={"o.playerType": 'a'})}
+		self.assertEqual(rates[0.25]["x_wins"], 40)
+		self.assertEqual(rates[0.25]["games"], 100)
+		rates = {rate["value"]: rate for rate in self.store.winRates("cValue", where={"o.playerType": 'r'})}
+		self.assertEqual(rates[0.0]["x_wins"], 95)
+		self.assertEqual(rates[1.0]["x_wins"], 83)
+
+
+class BitBoardTest(unittest.TestCase):
+	def test_matches_game_rules(self):
+		"""
+		Play random games on both engines and compare every position
+		"""
+		rng = random.Random(0)
+		for size in [4, 6, 8, 10]:
+			for _ in range(10):
+				board = game_rules.makeBoard(size, size)
+				board[0][0] = " "
+				board[0][1] = " "
+				bb = bitboard.fromList(board)
+				player = 'x'
+				moves = game_rules.getLegalMoves(board, player)
+				while moves:
+					self.assertEqual(bitboard.toList(bb), board)
+					self.assertEqual(sorted(bitboard.getLegalMoves(bb, player)), sorted(moves))
+					move = rng.choice(moves)
+					self.assertTrue(bitboard.isLegalMove(bb, player, move, False))
+					board = game_rules.makeMove(board, move)
+					bb = bitboard.makeMove(bb, move)
+					player = 'o' if player == 'x' else 'x'
+					moves = game_rules.getLegalMoves(board, player)
+				self.assertEqual(bitboard.getLegalMoves(bb, player), [])
+
+	def test_first_moves(self):
+		board = game_rules.makeBoard(8, 8)
+		bb = bitboard.fromList(board)
+		self.assertEqual(bitboard.getLegalMoves(bb, 'x'), game_rules.getLegalMoves(board, 'x'))
+		board[3][3] = " "
+		bb = bitboard.fromList(board)
+		self.assertEqual(bitboard.getLegalMoves(bb, 'o'), game_rules.getLegalMoves(board, 'o'))
+
+
 if __name__ == "__main__":
 	unittest.main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+import game_manager
+import results_store
+from player import makePlayer
+
+###########################################################################
+# Batches of games between two players, played in a process pool.
+# A player is given by its makePlayer arguments without the symbol, e.g.
+#     {"playerType": "c", "depth": 3, "numSimulate": 100, "cValue": 2.5,
+#      "sType": "random", "sdepth": 3, "make_graph": False}
+# Every game gets its own seed, drawn from the tournament seed, so a game can
+# be replayed on its own and a tournament repeats whatever the worker count.
+# Results are yielded as games finish, not in game order.
+# The pool's processes are daemons, which cannot start processes of their
+# own, so players searching with parallel or workers > 1 can only play in a
+# tournament of one worker, where the games are played in this process.
+###########################################################################
+
+def gameSeeds(games: int, seed=None) -> list:
+    rng = random.Random(seed)
+    return [rng.getrandbits(32) for i in range(games)]
+
+
+def checkPoolConfigs(configs):
+    """Raises ValueError for a player that would start processes of its own, see above."""
+    for config in configs:
+        if config.get("parallel") is not None or config.get("workers", 1) > 1:
+            raise ValueError("a player with parallel or workers > 1 cannot play in a pool of games, "
+                             "play them with workers=1: " + json.dumps(config))
+
+
+def playGame(job) -> dict:
+    """Plays one game and returns its result.
+
+    Args:
+        job (tuple): (game number, rows, cols, x's config, o's config, seed)
+
+    Returns:
+        dict: game number, seed, winner ('X' or 'O'), number of moves, seconds of each move and of the game.
+    """
+    game, rows, cols, config1, config2, seed = job
+    random.seed(seed)
+    start = time.perf_counter()
+    gm = game_manager.GameManager(rows, cols, makePlayer(symbol='x', **config1), makePlayer(symbol='o', **config2), log=None)
+    gm.play(PB=False)
+    return {"game": game,
+            "seed": seed,
+            "winner": gm.GetWinner(),
+            "moves": len(gm.move_times),
+            "move_times": gm.move_times,
+            "seconds": time.perf_counter() - start}
+
+
+def runTournament(config1: dict, config2: dict, games: int, workers=None, size=8, seed=None):
+    """Plays games between x (config1) and o (config2).
+
+    Args:
+        config1 (dict): makePlayer arguments of x, without the symbol.
+        config2 (dict): makePlayer arguments of o, without the symbol.
+        games (int): How many games to play.
+        workers (int, optional): Number of processes, one per CPU by default. 1 plays in this process.
+        size (int, optional): Rows and columns of the board. Defaults to 8.
+        seed (int, optional): Seed the game seeds are drawn from.
+
+    Yields:
+        dict: the result of playGame for each game, as each one finishes.
+
+    Raises:
+        ValueError: the games are played in a pool and a player searches in processes of its own.
+    """
+    jobs = [(game, size, size, config1, config2, gameSeed) for game, gameSeed in enumerate(gameSeeds(games, seed))]
+    workers = min(workers or os.cpu_count(), games)
+    if workers > 1:
+        checkPoolConfigs([config1, config2])
+    if workers <= 1:
+        for job in jobs:
+            yield playGame(job)
+        return
+    with multiprocessing.get_context().Pool(workers) as pool:
+        for result in pool.imap_unordered(playGame, jobs):
+            yield result
+
+
+def summarize(results: list) -> dict:
+    """Win counts and timings of a list of game results."""
+    moves = sum(result["moves"] for result in results)
+    move_seconds = sum(sum(result["move_times"]) for result in results)
+    return {"games": len(results),
+            "x_wins": sum(result["winner"] == 'X' for result in results),
+            "o_wins": sum(result["winner"] == 'O' for result in results),
+            "mean_moves": moves / len(results) if results else 0.0,
+            "mean_move_seconds": move_seconds / moves if moves else 0.0,
+            "max_move_seconds": max((max(result["move_times"], default=0.0) for result in results), default=0.0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a batch of games between two players in parallel.")
+    parser.add_argument("player1", help="JSON makePlayer arguments of x, without the symbol")
+    parser.add_argument("player2", help="JSON makePlayer arguments of o, without the symbol")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, one per CPU by default")
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--store", default=None, help="SQLite results store to add the games to, e.g. results.db")
+    args = parser.parse_args()
+    config1, config2 = json.loads(args.player1), json.loads(args.player2)
+    results = []
+    for result in runTournament(config1, config2, args.games, args.workers, args.size, args.seed):
+        results.append(result)
+        print(json.dumps({key: result[key] for key in ("game", "seed", "winner", "moves", "seconds")}), flush=True)
+    if args.store:
+        with results_store.ResultsStore(args.store) as store:
+            store.addTournament(config1, config2, results, args.size, args.seed)
+    print(json.dumps(summarize(results)))
+
+
+if __name__ == "__main__":
+    main()
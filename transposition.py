@@ -0,0 +1,134 @@
+from collections import namedtuple, OrderedDict
+from typing import Optional
+
+###########################################################################
+# Transposition table for alpha-beta search.
+# Entries are found by Zobrist position key (see zobrist.py). The value of an
+# entry is exact, or only a bound when the search that produced it was cut
+# off by the alpha-beta window.
+# LRUCache is the simpler memo used for the searches of alphabeta simulations,
+# which always search the full window and so only ever store exact results.
+###########################################################################
+
+EXACT = 0
+LOWER = 1   # the real value is >= entry.value (the search failed high)
+UPPER = 2   # the real value is <= entry.value (the search failed low)
+
+Entry = namedtuple('Entry', ['key', 'depth', 'value', 'flag', 'move', 'generation'])
+
+
+def boundFlag(value, alpha, beta):
+    """Returns the kind of entry for a value searched with the window (alpha, beta)."""
+    if value <= alpha: return UPPER
+    if value >= beta: return LOWER
+    return EXACT
+
+
+class TranspositionTable(object):
+    """ A fixed number of slots indexed by position key.
+
+    When two positions share a slot, an entry written during the current
+    search is only replaced by one searched at least as deep; entries left
+    over from earlier searches (see newSearch) are always replaced.
+    """
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError(f"Invalid transposition table size: {size}")
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def __str__(self):
+        return "{TranspositionTable size = " + str(self.size) + ", Hits: " + str(self.hits) + ", Misses: " + str(self.misses) + "}"
+
+    def newSearch(self):
+        """Marks the start of a new search, ageing every stored entry."""
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[Entry]:
+        entry = self.slots[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, value, flag: int, move):
+        index = key % self.size
+        old = self.slots[index]
+        if old is not None and old.key != key:
+            if old.generation == self.generation and old.depth > depth:
+                return
+            self.replacements += 1
+        self.slots[index] = Entry(key, depth, value, flag, move, self.generation)
+        self.stores += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.hits = self.misses = self.stores = self.replacements = 0
+
+    def stats(self) -> dict:
+        probes = self.hits + self.misses
+        return {"size": self.size,
+                "used": self.size - self.slots.count(None),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / probes if probes else 0.0,
+                "stores": self.stores,
+                "replacements": self.replacements}
+
+
+class LRUCache(object):
+    """ A map holding at most size entries, which forgets the least recently
+    used entry to make room for a new one. """
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError(f"Invalid cache size: {size}")
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return "{LRUCache size = " + str(self.size) + ", Hits: " + str(self.hits) + ", Misses: " + str(self.misses) + "}"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        elif len(self.entries) >= self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = value
+        self.stores += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"size": self.size,
+                "used": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions}
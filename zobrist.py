@@ -0,0 +1,90 @@
+import random
+import game_rules
+
+###########################################################################
+# Zobrist keys for Konane positions.
+# A position key is the XOR of one random 64-bit number per occupied square
+# (chosen by square and piece) plus a side key when 'o' is to move. A move
+# only changes a handful of squares, so keys are updated incrementally from
+# the undo records of game_rules.applyMove instead of rehashing the board.
+# Keys come from a fixed seed, so they are the same in every process and run.
+###########################################################################
+
+SEED = 1186
+_TABLES = {}
+
+
+class ZobristTable(object):
+    """ The random keys for every (square, piece) pair of one board size. """
+    def __init__(self, rows, cols, seed=SEED):
+        rng = random.Random("{}:{}x{}".format(seed, rows, cols))
+        self.rows, self.cols = rows, cols
+        self.pieces = {piece: [[rng.getrandbits(64) for c in range(cols)] for r in range(rows)] for piece in ('x', 'o')}
+        self.side = rng.getrandbits(64)
+
+    def __str__(self):
+        return "{ZobristTable " + str(self.rows) + "x" + str(self.cols) + "}"
+
+
+def getTable(rows, cols):
+    table = _TABLES.get((rows, cols))
+    if table is None:
+        table = _TABLES[(rows, cols)] = ZobristTable(rows, cols)
+    return table
+
+
+def hashBoard(board, symbol):
+    """Computes the key of a position from scratch.
+
+    Args:
+        board (list): The board to hash.
+        symbol (str): The side to move.
+
+    Returns:
+        int: The 64-bit position key.
+    """
+    table = getTable(len(board), len(board[0]))
+    key = table.side if symbol == 'o' else 0
+    for r, row in enumerate(board):
+        for c, piece in enumerate(row):
+            if piece != " ":
+                key ^= table.pieces[piece][r][c]
+    return key
+
+
+def updateKey(table, key, undo):
+    """Applies the change recorded by game_rules.applyMove to a key.
+
+    XOR is its own inverse, so the same call takes the move back out again.
+
+    Args:
+        table (ZobristTable): The keys for the board size.
+        key (int): The key before the move (or before the undo).
+        undo (tuple): The record returned by game_rules.applyMove.
+
+    Returns:
+        int: The key after the move (or after the undo).
+    """
+    move, player, other, captured = undo
+    keys = table.pieces[player]
+    key ^= keys[move[0][0]][move[0][1]] ^ keys[move[1][0]][move[1][1]] ^ table.side
+    keys = table.pieces[other]
+    for r, c in captured:
+        key ^= keys[r][c]
+    return key
+
+
+def applyMove(board, move, key):
+    """Plays a legal move in place with game_rules.applyMove and updates its key.
+
+    Returns:
+        (int: new key, tuple: undo record)
+    """
+    undo = game_rules.applyMove(board, move)
+    return updateKey(getTable(len(board), len(board[0])), key, undo), undo
+
+
+def undoMove(board, undo, key):
+    """Takes back a move played by applyMove and returns the restored key."""
+    game_rules.undoMove(board, undo)
+    return updateKey(getTable(len(board), len(board[0])), key, undo)